@@ -1,10 +1,21 @@
 import logging
 import httpx
+from typing import AsyncIterator
 from settings.settings import settings
+from utils.provider_utils import chat_completion_request, stream_chat_completion
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def _request(prompt: str, stream: bool = False):
+    return chat_completion_request(
+        settings.GROQ_BASE_URL or "https://api.groq.com/openai/v1/chat/completions",
+        settings.GROQ_API_KEY,
+        settings.GROQ_MODEL or "llama3-70b-8192",
+        prompt,
+        stream
+    )
+
 async def call_groq(prompt: str) -> str:
     if not settings.GROQ_API_KEY:
         raise Exception("Groq API key not configured")
@@ -12,24 +23,7 @@ async def call_groq(prompt: str) -> str:
     try:
         logger.info("🔹 [Groq] Making API call...")
 
-        url = settings.GROQ_BASE_URL or "https://api.groq.com/openai/v1/chat/completions"
-        if not url.endswith('/v1/chat/completions'):
-            url = f"{url.rstrip('/')}/v1/chat/completions"
-
-        headers = {
-            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-            "Content-Type": "application/json; charset=utf-8",
-        }
-
-        payload = {
-            "model": settings.GROQ_MODEL or "llama3-70b-8192",
-            "messages": [
-                {"role": "system", "content": "You are a helpful research assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            "max_tokens": 500,
-            "temperature": 0.7,
-        }
+        url, headers, payload = _request(prompt)
 
         async with httpx.AsyncClient() as client:
             response = await client.post(url, headers=headers, json=payload, timeout=30)
@@ -51,4 +45,13 @@ async def call_groq(prompt: str) -> str:
         raise Exception(f"Groq API request failed: {str(e)}")
     except Exception as e:
         logger.error(f"❌ [Groq] Error: {str(e)}")
-        raise Exception(f"Groq API call failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Groq API call failed: {str(e)}")
+
+async def stream_groq(prompt: str) -> AsyncIterator[str]:
+    """Yield the Groq reply piece by piece from its server-sent event stream."""
+    if not settings.GROQ_API_KEY:
+        raise Exception("Groq API key not configured")
+
+    logger.info("🔹 [Groq] Streaming API call...")
+    async for content in stream_chat_completion(*_request(prompt, stream=True)):
+        yield content
@@ -1,12 +1,22 @@
 import logging
 import asyncio
-from .openai_provider import call_openai
-from .groq_provider import call_groq
-from .ngu_provider import call_ngu
+from typing import AsyncIterator
+from .openai_provider import call_openai, stream_openai
+from .groq_provider import call_groq, stream_groq
+from .ngu_provider import call_ngu, stream_ngu
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Start of the reply returned when every provider fails
+ALL_PROVIDERS_FAILED_MESSAGE = (
+    "I apologize, but I'm currently unable to process your request due to technical issues "
+    "with the AI services. Please try again later."
+)
+
+class LLMStreamInterrupted(Exception):
+    """A provider failed after part of its reply had already been streamed"""
+
 async def get_llm_response(prompt: str) -> str:
     """Try LLM providers in order with proper error handling"""
 
@@ -41,7 +51,45 @@ async def get_llm_response(prompt: str) -> str:
     error_summary = "; ".join(errors)
     logger.error(f"❌ All LLM providers failed: {error_summary}")
 
-    return f"I apologize, but I'm currently unable to process your request due to technical issues with the AI services. Please try again later. Error details: {error_summary}"
+    return f"{ALL_PROVIDERS_FAILED_MESSAGE} Error details: {error_summary}"
+
+async def get_llm_response_stream(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream the reply from the first provider that starts answering.
+    A provider that fails before its first chunk falls through to the next one;
+    a failure mid-stream raises LLMStreamInterrupted, since earlier chunks were
+    already sent and the reply is incomplete.
+    """
+    providers = [
+        ("OpenAI", stream_openai),
+        ("Groq", stream_groq),
+        ("NGU", stream_ngu)
+    ]
+
+    errors = []
+
+    for provider_name, provider_stream in providers:
+        started = False
+        try:
+            logger.info(f"🔄 Streaming from {provider_name}...")
+            async for chunk in provider_stream(prompt):
+                started = True
+                yield chunk
+            if started:
+                logger.info(f"✅ {provider_name} stream finished")
+                return
+            errors.append(f"{provider_name} failed: empty response")
+        except Exception as e:
+            if started:
+                logger.error(f"❌ {provider_name} stream interrupted: {e}")
+                raise LLMStreamInterrupted(f"{provider_name} stream interrupted: {e}") from e
+            error_msg = f"{provider_name} failed: {str(e)}"
+            logger.warning(f"⚠️ {error_msg}")
+            errors.append(error_msg)
+
+    error_summary = "; ".join(errors)
+    logger.error(f"❌ All LLM providers failed: {error_summary}")
+    yield f"{ALL_PROVIDERS_FAILED_MESSAGE} Error details: {error_summary}"
 
 # Debug endpoint to check API configuration
 # @router.get("/debug/api-status")
@@ -1,10 +1,21 @@
 import logging
 import httpx
+from typing import AsyncIterator
 from settings.settings import settings
+from utils.provider_utils import chat_completion_request, stream_chat_completion
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def _request(prompt: str, stream: bool = False):
+    return chat_completion_request(
+        settings.NGU_BASE_URL,
+        settings.NGU_API_KEY,
+        settings.NGU_MODEL or "qwen2.5-coder:7b",
+        prompt,
+        stream
+    )
+
 async def call_ngu(prompt: str) -> str:
     if not settings.NGU_API_KEY or not settings.NGU_BASE_URL:
         raise Exception("NGU API key or base URL not configured")
@@ -12,22 +23,7 @@ async def call_ngu(prompt: str) -> str:
     try:
         logger.info("🔹 [NGU] Making API call...")
 
-        url = f"{settings.NGU_BASE_URL}/v1/chat/completions"
-
-        headers = {
-            "Authorization": f"Bearer {settings.NGU_API_KEY}",
-            "Content-Type": "application/json; charset=utf-8"
-        }
-
-        payload = {
-            "model": settings.NGU_MODEL or "qwen2.5-coder:7b",
-            "messages": [
-                {"role": "system", "content": "You are a helpful research assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 500,
-            "temperature": 0.7
-        }
+        url, headers, payload = _request(prompt)
 
         async with httpx.AsyncClient() as client:
             response = await client.post(url, headers=headers, json=payload, timeout=30)
@@ -50,3 +46,12 @@ async def call_ngu(prompt: str) -> str:
     except Exception as e:
         logger.error(f"❌ [NGU] Error: {str(e)}")
         raise Exception(f"NGU API call failed: {str(e)}")
+
+async def stream_ngu(prompt: str) -> AsyncIterator[str]:
+    """Yield the NGU reply piece by piece from its server-sent event stream."""
+    if not settings.NGU_API_KEY or not settings.NGU_BASE_URL:
+        raise Exception("NGU API key or base URL not configured")
+
+    logger.info("🔹 [NGU] Streaming API call...")
+    async for content in stream_chat_completion(*_request(prompt, stream=True)):
+        yield content
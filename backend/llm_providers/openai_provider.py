@@ -1,4 +1,5 @@
 import logging
+from typing import AsyncIterator
 from settings.settings import settings
 from langchain_openai import ChatOpenAI
 
@@ -38,4 +39,21 @@ async def call_openai(prompt: str) -> str:
 
     except Exception as e:
         logger.error(f"❌ [OpenAI] Error: {str(e)}")
-        raise Exception(f"OpenAI API call failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"OpenAI API call failed: {str(e)}")
+
+async def stream_openai(prompt: str) -> AsyncIterator[str]:
+    """Yield the OpenAI reply piece by piece as it is generated."""
+    if not openai_client or not settings.OPENAI_API_KEY:
+        raise Exception("OpenAI API key not configured")
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    messages = [
+        SystemMessage(content="You are a helpful research assistant."),
+        HumanMessage(content=prompt)
+    ]
+
+    logger.info("🔹 [OpenAI] Streaming API call...")
+    async for chunk in openai_client.astream(messages):
+        if chunk.content:
+            yield chunk.content
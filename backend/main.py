@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from services.db_session import create_db_and_tables
+from services.web_search import close_session as close_search_session
+from services.extractor_service import shutdown_pdf_pool
 from routers import upload, session, chat, documents, search, summary
 
 app = FastAPI(
@@ -21,6 +23,11 @@ app.add_middleware(
 def on_startup():
     create_db_and_tables()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_search_session()
+    shutdown_pdf_pool()
+
 @app.get("/")
 def read_root():
     return {"message": "SynthesisTalk backend is running!"}
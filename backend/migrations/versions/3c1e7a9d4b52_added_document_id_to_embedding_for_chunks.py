@@ -0,0 +1,41 @@
+"""Added document_id to table Embedding for per-chunk document embeddings.
+
+Revision ID: 3c1e7a9d4b52
+Revises: 2638aa2e6392
+Create Date: 2026-10-15 10:12:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e7a9d4b52'
+down_revision: Union[str, Sequence[str], None] = '2638aa2e6392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding', sa.Column('document_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        op.f('embedding_document_id_fkey'), 'embedding', 'document',
+        ['document_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_embedding_document_id'), 'embedding', ['document_id'], unique=False)
+    # Approximate nearest-neighbour index for cosine-distance chunk search
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_embedding_embedding_ivfflat "
+        "ON embedding USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_embedding_embedding_ivfflat")
+    op.drop_index(op.f('ix_embedding_document_id'), table_name='embedding')
+    op.drop_constraint(op.f('embedding_document_id_fkey'), 'embedding', type_='foreignkey')
+    op.drop_column('embedding', 'document_id')
@@ -0,0 +1,52 @@
+"""HNSW and session_id indexes on embedding, document_id on whole-document embeddings.
+
+Revision ID: 7b2f4e1c9a30
+Revises: 3c1e7a9d4b52
+Create Date: 2026-10-16 09:40:12.517204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2f4e1c9a30'
+down_revision: Union[str, Sequence[str], None] = '3c1e7a9d4b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ivfflat centroids were trained on a nearly empty table; HNSW needs no
+    # training and stays accurate as rows are added
+    op.execute("DROP INDEX IF EXISTS ix_embedding_embedding_ivfflat")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_embedding_embedding_hnsw "
+        "ON embedding USING hnsw (embedding vector_cosine_ops)"
+    )
+    # Session-filtered searches read the session's rows through this index and
+    # rank them exactly; HNSW alone would filter after its approximate scan
+    op.create_index(op.f('ix_embedding_session_id'), 'embedding', ['session_id'], unique=False)
+    # Whole-document embeddings get document_id too, so searches join on one column
+    op.execute(
+        "UPDATE embedding SET document_id = document.id "
+        "FROM document "
+        "WHERE document.embedding_id = embedding.id AND embedding.document_id IS NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE embedding SET document_id = NULL "
+        "FROM document "
+        "WHERE document.embedding_id = embedding.id"
+    )
+    op.drop_index(op.f('ix_embedding_session_id'), table_name='embedding')
+    op.execute("DROP INDEX IF EXISTS ix_embedding_embedding_hnsw")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_embedding_embedding_ivfflat "
+        "ON embedding USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)"
+    )
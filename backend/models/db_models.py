@@ -1,7 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import Column
+from sqlalchemy import Column, Integer, ForeignKey
 from pgvector.sqlalchemy import Vector
 
 class Session(SQLModel, table=True):
@@ -27,13 +27,24 @@ class Document(SQLModel, table=True):
     filename: str
     text: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
-    embedding: Optional["Embedding"] = Relationship(back_populates="documents")
+    embedding: Optional["Embedding"] = Relationship(
+        back_populates="documents",
+        sa_relationship_kwargs={"foreign_keys": "Document.embedding_id"}
+    )
 
 class Embedding(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    session_id: int = Field(foreign_key="session.id")
+    session_id: int = Field(foreign_key="session.id", index=True)
+    # Set for per-chunk embeddings of an uploaded document
+    document_id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(Integer, ForeignKey("document.id", ondelete="CASCADE", use_alter=True), nullable=True, index=True)
+    )
     text: str
     embedding: list[float] = Field(sa_column=Column(Vector(384)))  # Dimension for all-MiniLM-L6-v2 model
     created_at: datetime = Field(default_factory=datetime.utcnow)
     messages: list[Message] = Relationship(back_populates="embedding")
-    documents: list[Document] = Relationship(back_populates="embedding")
+    documents: list[Document] = Relationship(
+        back_populates="embedding",
+        sa_relationship_kwargs={"foreign_keys": "Document.embedding_id"}
+    )
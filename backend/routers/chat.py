@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import requests
@@ -7,11 +8,11 @@ import logging
 import json
 
 from models.db_models import Message, Document, Session as ResearchSession
-from services.db_session import get_session
-from services.embedding_service import generate_embedding, store_embedding
+from services.db_session import get_session, get_async_session
+from services.embedding_service import store_embedding, store_embeddings_bulk
 from services.document_service import save_document, get_documents_text
 from services.context_service import ContextBuilder, build_prompt, build_context_with_reasoning
-from services.feedback_analysis import analyze_feedback
+from services.feedback_analysis import analyze_feedback, invalidate_feedback_cache
 from services.summarize_service import generate_summary
 from services.unified_search_service import search_service
 from settings.settings import settings
@@ -49,7 +50,11 @@ def get_messages(session_id: int, db: Session = Depends(get_session)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve messages and documents: {str(e)}")
 
 @router.post("/session/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)):
+async def chat_endpoint(
+    request: ChatRequest,
+    db: Session = Depends(get_session),
+    async_db: AsyncSession = Depends(get_async_session)
+):
     """
     Handle user messages and generate bot responses with optional reasoning.
     """
@@ -67,7 +72,6 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)
         )
         db.add(user_message)
         db.commit()
-        db.refresh(user_message)
 
         logger.info("Checking for summarize request...")
         # Check if the message is a 'summarize' request
@@ -75,7 +79,7 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)
             try: 
                 logger.info("Generating summary...")
                 # Generate a summary in the default format (e.g., 'paragraph')
-                summary_text = generate_summary(request.message, format="paragraph")
+                summary_text = await generate_summary(request.message, format="paragraph")
 
                 logger.info("Storing summary as bot response...")
                 # Save the summary as a bot response
@@ -87,13 +91,10 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)
                 )
                 db.add(bot_message)
                 db.commit()
-                db.refresh(bot_message)
 
                 logger.info("Generating and storing embedding for summary...")
                 # Generate and store embedding for the summary
-                embedding_vector = generate_embedding(summary_text)
-                if embedding_vector:
-                    store_embedding(bot_message.id, embedding_vector, db)
+                store_embedding(db, request.session_id, summary_text)
 
                 return ChatResponse(
                     success=True,
@@ -108,22 +109,27 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)
 
         logger.info("Building context...")
         # Build context with optional reasoning
-        if request.enable_reasoning:
-            logger.info(f"Using reasoning type: {request.reasoning_type.value}")
-            context_result = await build_context_with_reasoning(
-                db=db,
-                session_id=request.session_id,
-                user_message=request.message,
-                reasoning_type=request.reasoning_type
-            )
-        else:
-            context_builder = ContextBuilder(db, enable_reasoning=False)
-            context_result = await context_builder.build_context(
-                session_id=request.session_id,
-                user_message=request.message,
-                include_web_search=request.enable_web_search,
-                include_documents=request.enable_document_search
-            )
+        try:
+            if request.enable_reasoning:
+                logger.info(f"Using reasoning type: {request.reasoning_type.value}")
+                context_result = await build_context_with_reasoning(
+                    db=async_db,
+                    session_id=request.session_id,
+                    user_message=request.message,
+                    reasoning_type=request.reasoning_type
+                )
+            else:
+                context_builder = ContextBuilder(async_db, enable_reasoning=False)
+                context_result = await context_builder.build_context(
+                    session_id=request.session_id,
+                    user_message=request.message,
+                    include_web_search=request.enable_web_search,
+                    include_documents=request.enable_document_search
+                )
+        finally:
+            # Return the async connection to its small pool now instead of holding it
+            # through the LLM call below
+            await async_db.close()
 
         logger.info("Generating prompt...")
         # Generate prompt with optional reasoning
@@ -166,8 +172,7 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_session)
 
         logger.info("Generating and storing embeddings...")
         # Generate and store embeddings
-        store_embedding(db, request.session_id, request.message)
-        store_embedding(db, request.session_id, bot_message_content)
+        store_embeddings_bulk(db, request.session_id, [request.message, bot_message_content])
 
         logger.info("Performing combined search if web search is enabled...")
         # Perform combined search if web search is enabled
@@ -243,4 +248,5 @@ def provide_feedback(message_id: int, thumbs_up: Optional[bool] = None, thumbs_d
                 logger.info(f"Avoiding similar response: {session_message.content}")
 
     db.commit()
+    invalidate_feedback_cache()
     return {"message": "Feedback recorded successfully"}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
+from sqlalchemy import func
 from services.db_session import get_session
 from models.db_models import Document
 import logging
@@ -9,14 +10,17 @@ router = APIRouter()
 @router.get("/documents/{session_id}")
 async def get_documents(session_id: int, db: Session = Depends(get_session)):
     try:
-        query = select(Document).where(Document.session_id == session_id)
+        # Read-only listing: fetch plain columns and let the database cut the preview
+        query = select(
+            Document.id, Document.filename, func.left(Document.text, 500).label("text_preview")
+        ).where(Document.session_id == session_id)
         documents = db.exec(query).all()
         if not documents:
             logging.warning(f"No documents found for session_id: {session_id}")
             raise HTTPException(status_code=404, detail="No documents found")
         logging.info(f"Documents retrieved: {len(documents)} documents for session_id {session_id}")
         return [
-            {"id": doc.id, "filename": doc.filename, "text_preview": doc.text[:500]}
+            {"id": doc.id, "filename": doc.filename, "text_preview": doc.text_preview}
             for doc in documents
         ]
     except HTTPException as http_exc:
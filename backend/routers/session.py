@@ -17,7 +17,6 @@ def create_session(name: str, db: Session = Depends(get_session)):
     new_session = ResearchSession(name=name)
     db.add(new_session)
     db.commit()
-    db.refresh(new_session)
     return new_session
 
 @router.get("/session/current")
@@ -31,7 +30,6 @@ def get_current_session(db: Session = Depends(get_session)):
     new_session = ResearchSession(name="New Session")
     db.add(new_session)
     db.commit()
-    db.refresh(new_session)
     return {"session_id": new_session.id, "name": new_session.name}
 
 # List all session to select session
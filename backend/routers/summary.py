@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 from datetime import datetime
 import logging
 import traceback
+from functools import partial
 from typing import Optional
+from anyio import from_thread
 
 from models.api_models import StructuredSummaryRequest, ChatResponse
 from models.db_models import Message, Session as SessionModel
 from services.db_session import get_session
-from services.embedding_service import generate_embedding, store_embedding
-from services.summarize_service import generate_summary
+from services.embedding_service import store_embedding
+from services.summarize_service import generate_summary, generate_summaries, stream_summary
 
 router = APIRouter()
 
@@ -17,6 +20,8 @@ router = APIRouter()
 logger = logging.getLogger("summary_logger")
 
 # TODO: Fix summarize text through null file upload
+# Sync endpoint (runs in the worker thread pool); the async summarizer is
+# executed on the server's event loop via anyio.from_thread
 @router.post("/summarize")
 def summarize_endpoint(
     session_id: int = Form(..., description="Session ID (must be >= 1)"),
@@ -65,7 +70,6 @@ def summarize_endpoint(
             )
             db.add(new_session)
             db.commit()
-            db.refresh(new_session)
             # Use the actual ID from the database
             session_id = new_session.id
 
@@ -75,20 +79,22 @@ def summarize_endpoint(
             file_content = file.file.read()
             file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
             
-            summary_text = generate_summary(
+            summary_text = from_thread.run(partial(
+                generate_summary,
                 input_data=file_content,
                 format=format,
                 input_type="file",
                 file_type=file_extension
-            )
+            ))
             metadata = {"input_type": "file", "filename": file.filename}
         else:
             # Handle text input
-            summary_text = generate_summary(
+            summary_text = from_thread.run(partial(
+                generate_summary,
                 input_data=text,
                 format=format,
                 input_type="text"
-            )
+            ))
             metadata = {"input_type": "text", "filename": None}
         
         logger.debug(f"File parameter type: {type(file)}")
@@ -102,12 +108,9 @@ def summarize_endpoint(
         )
         db.add(bot_message)
         db.commit()  # Commit the transaction
-        db.refresh(bot_message)  # Refresh to get the ID
 
         # Generate and store embedding for the summary
-        embedding_vector = generate_embedding(summary_text)
-        if embedding_vector:
-            store_embedding(db, session_id, summary_text)
+        store_embedding(db, session_id, summary_text)
 
         return ChatResponse(
             success=True,
@@ -123,4 +126,49 @@ def summarize_endpoint(
         error_details = traceback.format_exc()
         logger.error(f"Error in structured summary endpoint: {e}")
         logger.error(f"Full traceback: {error_details}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate structured summary: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate structured summary: {str(e)}")
+
+@router.post("/summarize/stream")
+async def summarize_stream_endpoint(
+    format: str = Form(..., description="Summary format: bullet, paragraph, or insight"),
+    text: str = Form(..., description="Text to summarize")
+):
+    """
+    Stream a summary of the given text as plain text while the LLM generates it,
+    so clients can show the first words without waiting for the whole reply.
+    Streamed summaries are not saved to a session.
+    """
+    valid_formats = {"bullet", "paragraph", "insight"}
+    if format not in valid_formats:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{format}'. Valid formats are: {', '.join(valid_formats)}.")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+
+    return StreamingResponse(stream_summary(text, format), media_type="text/plain; charset=utf-8")
+
+@router.post("/summarize/batch")
+async def summarize_batch_endpoint(
+    formats: str = Form(..., description="Comma-separated summary formats: bullet, paragraph, insight"),
+    text: str = Form(..., description="Text to summarize")
+):
+    """
+    Summarize the given text in several formats with a single LLM call.
+    Batch summaries are not saved to a session.
+
+    - **formats**: e.g. "bullet,paragraph,insight"
+    - **text**: Text to summarize
+    """
+    valid_formats = {"bullet", "paragraph", "insight"}
+    requested = [f.strip() for f in formats.split(",") if f.strip()]
+    invalid = [f for f in requested if f not in valid_formats]
+    if not requested or invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid formats '{formats}'. Valid formats are: {', '.join(valid_formats)}.")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+
+    try:
+        summaries = await generate_summaries(text, requested)
+    except Exception as e:
+        logger.error(f"Error in batch summary endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate summaries: {str(e)}")
+    return {"success": True, "summaries": summaries}
@@ -3,30 +3,138 @@ Context Service for building comprehensive context from multiple sources
 Integrated with advanced reasoning capabilities
 """
 import logging
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 from sqlmodel import Session, select
-from sqlalchemy.sql import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
 from models.db_models import Message, Document
 from models.api_models import ReasoningType, QuestionType
-from services.document_service import search_documents, get_documents_by_session, get_document_by_id
+from services.document_service import search_documents_async, get_document_previews_async
 from services.web_search import search_web
-from services.embedding_service import generate_embedding
-from services.feedback_analysis import analyze_feedback
+from services.embedding_service import embedding_cache_stats, generate_embedding_cached
+from services.feedback_analysis import feedback_prompt_notes_cached
 from services.reasoning_service import (
     chain_of_thought_reasoning, 
     react_reasoning, 
     hybrid_reasoning,
     classify_question
 )
-from utils.text_utils import trim_text_to_token_limit
+from utils.text_utils import trim_text_to_token_limit, count_tokens, count_tokens_batch, estimate_tokens
+from settings.settings import settings
 import asyncio
+import time
+import numpy as np
+from collections import OrderedDict, deque
 
 logger = logging.getLogger(__name__)
 
+# Per-item cap on snippets embedded in the context, applied before concatenation
+MAX_SNIPPET_CHARS = 800
+
+def _clip(snippet: str, max_chars: int = MAX_SNIPPET_CHARS) -> str:
+    """Clip a snippet to max_chars, marking the cut with an ellipsis"""
+    return snippet if len(snippet) <= max_chars else snippet[:max_chars] + "…"
+
+# Semantic cache of retrieval results: session_id -> deque of
+# (query vector, cache key, expiry, (documents, doc_results, web_results)),
+# least recently used sessions evicted first. Conversation history is not cached,
+# so the key only holds state a chat turn leaves alone and a repeated or
+# paraphrased question hits on the next turn
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_SIZE = 64
+SEMANTIC_CACHE_SESSIONS = 256
+SEMANTIC_CACHE_TTL = 600  # seconds, so cached web results age out like the web search cache
+_SEMANTIC_CACHE: "OrderedDict[int, deque]" = OrderedDict()
+
+def _normalized_query_vector(user_message: str) -> Optional[np.ndarray]:
+    vector = generate_embedding_cached(user_message)
+    if vector is None:
+        return None
+    return vector / (np.linalg.norm(vector) + 1e-9)
+
+def _recent_messages_statement(session_id: int, limit: int, after_id: int = 0):
+    """Id, sender and content of the newest messages after after_id, returned oldest first"""
+    recent = (
+        select(Message.id, Message.sender, Message.content)
+        .where(Message.session_id == session_id, Message.id > after_id)
+        .order_by(Message.id.desc())
+        .limit(limit)
+        .subquery()
+    )
+    return select(recent.c.id, recent.c.sender, recent.c.content).order_by(recent.c.id.asc())
+
+def _render_message(sender: str, content: str) -> str:
+    return f"{'You' if sender == 'user' else 'Assistant'}: {content}"
+
+# Rendered transcript tails: session_id -> (last message id, lines oldest first, whole history cached).
+# Messages are append-only, so each build only fetches rows newer than the cached last id.
+HISTORY_CACHE_MESSAGES = 50
+HISTORY_CACHE_SESSIONS = 256
+_HISTORY_CACHE: "OrderedDict[int, Tuple[int, Tuple[str, ...], bool]]" = OrderedDict()
+
+def _history_cache_store(session_id: int, last_id: int, lines: Tuple[str, ...], complete: bool):
+    cached = _HISTORY_CACHE.get(session_id)
+    # A concurrent build may already have stored a newer tail
+    if cached is None or cached[0] <= last_id:
+        _HISTORY_CACHE[session_id] = (last_id, lines, complete)
+    _HISTORY_CACHE.move_to_end(session_id)
+    if len(_HISTORY_CACHE) > HISTORY_CACHE_SESSIONS:
+        _HISTORY_CACHE.popitem(last=False)
+
+AVAILABLE_TOOLS = ["web_search", "document_search", "calculation", "analysis"]
+
+# Reasoning dispatch table: (context, user_message, question_type) -> reasoning text
+_REASONERS = {
+    ReasoningType.CHAIN_OF_THOUGHT: lambda context, user_message, question_type:
+        chain_of_thought_reasoning(context, user_message, question_type),
+    ReasoningType.REACT: lambda context, user_message, question_type:
+        react_reasoning(context, user_message, AVAILABLE_TOOLS),
+    ReasoningType.HYBRID: lambda context, user_message, question_type:
+        hybrid_reasoning(context, user_message, AVAILABLE_TOOLS),
+}
+
+async def _no_results() -> list:
+    return []
+
+def _semantic_cache_lookup(session_id: int, query_vector: np.ndarray, cache_key: tuple) -> Optional[tuple]:
+    """Return cached retrieval results for a semantically equivalent query with the same cache key"""
+    session_entries = _SEMANTIC_CACHE.get(session_id)
+    if session_entries is None:
+        return None
+    _SEMANTIC_CACHE.move_to_end(session_id)
+    now = time.monotonic()
+    entries = [entry for entry in session_entries if entry[1] == cache_key and entry[2] > now]
+    if not entries:
+        return None
+    scores = np.stack([entry[0] for entry in entries]) @ query_vector
+    best = int(np.argmax(scores))
+    if scores[best] < SEMANTIC_CACHE_THRESHOLD:
+        return None
+    return entries[best][3]
+
+def _semantic_cache_store(session_id: int, query_vector: np.ndarray, cache_key: tuple, retrieval: tuple):
+    entries = _SEMANTIC_CACHE.get(session_id)
+    if entries is None:
+        entries = _SEMANTIC_CACHE[session_id] = deque(maxlen=SEMANTIC_CACHE_SIZE)
+    entries.append((query_vector, cache_key, time.monotonic() + SEMANTIC_CACHE_TTL, retrieval))
+    _SEMANTIC_CACHE.move_to_end(session_id)
+    if len(_SEMANTIC_CACHE) > SEMANTIC_CACHE_SESSIONS:
+        _SEMANTIC_CACHE.popitem(last=False)
+
+@dataclass(slots=True)
+class ContextPart:
+    """A single block of context gathered from one source"""
+    type: str
+    content: str
+    priority: int
+    token_count: int = 0
+
 class ContextBuilder:
     """Builds context from multiple sources for LLM conversations with advanced reasoning"""
     
-    def __init__(self, db: Session, enable_reasoning: bool = True, reasoning_type: ReasoningType = ReasoningType.HYBRID):
+    def __init__(self, db: AsyncSession, enable_reasoning: bool = True, reasoning_type: ReasoningType = ReasoningType.HYBRID):
         self.db = db
         self.max_context_tokens = 8000  # Adjust based on your model's context limit
         self.enable_reasoning = enable_reasoning
@@ -49,6 +157,24 @@ class ContextBuilder:
         if reasoning_type is None:
             reasoning_type = self.reasoning_type
             
+        # Reuse document and web results of a semantically equivalent query while
+        # the session's documents are unchanged
+        query_vector = None
+        cache_key = None
+        cached_retrieval = None
+        try:
+            query_vector = await asyncio.to_thread(_normalized_query_vector, user_message)
+            if query_vector is not None:
+                cache_key = (
+                    await self._document_state(session_id) if include_documents else None,
+                    include_web_search,
+                    include_documents,
+                )
+                cached_retrieval = _semantic_cache_lookup(session_id, query_vector, cache_key)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            cache_key = None
+        
         context_parts = []
         metadata = {
             "sources_used": [],
@@ -65,124 +191,232 @@ class ContextBuilder:
             question_type = classify_question(user_message)
             metadata["question_type"] = question_type.value
         
-        try:
-            # 1. Get conversation history
-            if include_conversation_history:
-                history_context = await self._get_conversation_history(
-                    session_id, max_history_messages
-                )
-                if history_context:
-                    context_parts.append({
-                        "type": "conversation_history",
-                        "content": history_context,
-                        "priority": 1
-                    })
-                    metadata["sources_used"].append("conversation_history")
-            
-            # 2. Search documents if available
-            if include_documents:
-                doc_results = await search_documents(user_message, session_id, self.db)
-                if doc_results:
-                    doc_context = self._format_document_results(doc_results)
-                    context_parts.append({
-                        "type": "documents",
-                        "content": doc_context,
-                        "priority": 2
-                    })
-                    metadata["sources_used"].append("documents")
-                    metadata["search_results"]["documents"] = len(doc_results)
-                else:
-                    # Fallback: get general document context if no search results
-                    general_docs = self._get_all_documents_for_context(session_id, max_docs=2)
-                    if general_docs:
-                        context_parts.append({
-                            "type": "general_documents",
-                            "content": general_docs,
-                            "priority": 4  # Lower priority than search results
-                        })
-                        metadata["sources_used"].append("general_documents")
-            
-            # 3. Web search for current information
-            if include_web_search:
-                web_results = await search_web(user_message, num_results=3)
-                if web_results and any(r.get("title") != "Search Unavailable" for r in web_results):
-                    web_context = self._format_web_results(web_results)
-                    context_parts.append({
-                        "type": "web_search",
-                        "content": web_context,
-                        "priority": 3
-                    })
-                    metadata["sources_used"].append("web_search")
-                    metadata["search_results"]["web"] = len(web_results)
-            
-            # 4. Enhance context with additional document details if needed
-            context_parts = self._enhance_context_with_document_details(context_parts)
-            
-            # 5. Build final context within token limits
-            final_context = self._combine_context_parts(context_parts, user_message)
-            
-            # 6. Apply reasoning if enabled
-            reasoning_output = None
-            if self.enable_reasoning and reasoning_type:
-                reasoning_output = self._apply_reasoning(
-                    final_context, user_message, reasoning_type, question_type
-                )
-                metadata["reasoning_output"] = "Applied"
-                # Store the actual reasoning text
-                metadata["reasoning_text"] = reasoning_output
+        max_messages = max_history_messages if include_conversation_history else 0
+        if cached_retrieval is not None:
+            messages, _ = await self._prefetch_session_state(session_id, max_messages, False)
+            documents, doc_results, web_results = cached_retrieval
+            metadata["cache"] = "hit"
+        else:
+            messages, documents, doc_results, web_results = await self._retrieve(
+                session_id, user_message, max_messages, include_documents, include_web_search, metadata
+            )
+            metadata["cache"] = "miss"
+            # Failed, timed-out or unavailable sources would otherwise stay missing for every paraphrase
+            cacheable = (
+                "errors" not in metadata
+                and "web_timeout" not in metadata["search_results"]
+                and not any(r.get("title") == "Search Unavailable" for r in web_results)
+            )
+            if cache_key is not None and cacheable:
+                _semantic_cache_store(session_id, query_vector, cache_key, (documents, doc_results, web_results))
+        
+        history_context = self._format_conversation_history(messages)
+        if history_context:
+            context_parts.append(ContextPart(
+                type="conversation_history",
+                content=history_context,
+                priority=1
+            ))
+            metadata["sources_used"].append("conversation_history")
+        
+        if doc_results:
+            doc_context = self._format_document_results(doc_results)
+            context_parts.append(ContextPart(
+                type="documents",
+                content=doc_context,
+                priority=2
+            ))
+            metadata["sources_used"].append("documents")
+            metadata["search_results"]["documents"] = len(doc_results)
+        elif documents:
+            # Fallback: general document context if no search results
+            general_docs = self._format_session_documents(documents, max_docs=2)
+            context_parts.append(ContextPart(
+                type="general_documents",
+                content=general_docs,
+                priority=4  # Lower priority than search results
+            ))
+            metadata["sources_used"].append("general_documents")
+        
+        if web_results and any(r.get("title") != "Search Unavailable" for r in web_results):
+            web_context = self._format_web_results(web_results)
+            context_parts.append(ContextPart(
+                type="web_search",
+                content=web_context,
+                priority=3
+            ))
+            metadata["sources_used"].append("web_search")
+            metadata["search_results"]["web"] = len(web_results)
+        
+        # UTF-8 byte lengths bound the token counts from above: when even they fit
+        # the budget every part is kept whole, so estimates are enough. Otherwise
+        # count every part's tokens exactly in one batched tiktoken call
+        contents = [part.content for part in context_parts]
+        byte_total = sum(len(content.encode("utf-8")) for content in contents + [user_message])
+        if byte_total < self.max_context_tokens:
+            token_counts = [estimate_tokens(content) for content in contents]
+        else:
+            token_counts = count_tokens_batch(contents)
+        for part, token_count in zip(context_parts, token_counts):
+            part.token_count = token_count
+        
+        # 4. Enhance context with additional document details if needed
+        context_parts = self._enhance_context_with_document_details(context_parts)
+        metadata["token_usage"] = {part.type: part.token_count for part in context_parts}
+        
+        # 5. Build final context within token limits
+        final_context = self._combine_context_parts(context_parts, user_message)
+        
+        # 6. Apply reasoning if enabled
+        reasoning_output = None
+        if self.enable_reasoning and reasoning_type:
+            reasoning_output = self._apply_reasoning(
+                final_context, user_message, reasoning_type, question_type
+            )
+            metadata["reasoning_output"] = "Applied"
+            # Store the actual reasoning text
+            metadata["reasoning_text"] = reasoning_output
+        
+        metadata["embedding_cache"] = embedding_cache_stats()
+        
+        # Log the final context and metadata
+        logger.info("Final context built:")
+        logger.info(final_context)
+        logger.info("Metadata:")
+        logger.info(metadata)
 
-            
-            # Log the final context and metadata
-            logger.info("Final context built:")
-            logger.info(final_context)
-            logger.info("Metadata:")
-            logger.info(metadata)
-
-            return {
-                "context": final_context,
-                "reasoning": reasoning_output,
-                "metadata": metadata,
-                "user_message": user_message,
-                "question_type": question_type
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to build comprehensive context: {e}")
-            return {
-                "context": f"I'll help you with: {user_message}",
-                "reasoning": None,
-                "metadata": {"sources_used": [], "error": str(e)},
-                "user_message": user_message,
-                "question_type": None
-            }
+        return {
+            "context": final_context,
+            "reasoning": reasoning_output,
+            "metadata": metadata,
+            "user_message": user_message,
+            "question_type": question_type
+        }
     
-    async def _get_conversation_history(self, session_id: int, max_messages: int) -> str:
-        """Get recent conversation history"""
-        try:
-            statement = (
-                select(Message)
-                .where(Message.session_id == session_id)
-                .order_by(Message.timestamp.desc())
-                .limit(max_messages)
+    async def _document_state(self, session_id: int) -> tuple:
+        """Document count and latest document id, so cached results never outlive an upload or delete"""
+        statement = select(func.count(Document.id), func.max(Document.id)).where(Document.session_id == session_id)
+        return tuple((await self.db.execute(statement)).one())
+    
+    async def _retrieve(
+        self,
+        session_id: int,
+        user_message: str,
+        max_messages: int,
+        include_documents: bool,
+        include_web_search: bool,
+        metadata: Dict[str, Any]
+    ) -> Tuple[List[Any], List[Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Load history, documents and document results alongside the web search, noting failures in metadata"""
+        messages = []
+        documents = []
+        doc_results = []
+        web_results = []
+        
+        # Session DB work and web search are independent, so run them concurrently;
+        # a failure in one branch only drops that source from the context.
+        # Web search is bounded by a deadline and cancelled if it overruns.
+        web_search = (
+            asyncio.wait_for(search_web(user_message, num_results=3), timeout=settings.WEB_SEARCH_TIMEOUT)
+            if include_web_search else _no_results()
+        )
+        session_outcome, web_outcome = await asyncio.gather(
+            self._load_session_context(
+                session_id,
+                user_message,
+                max_messages,
+                include_documents
+            ),
+            web_search,
+            return_exceptions=True
+        )
+        
+        if isinstance(session_outcome, BaseException):
+            logger.error(f"Failed to load session context: {session_outcome}")
+            metadata["errors"] = [str(session_outcome)]
+        else:
+            messages, documents, doc_results = session_outcome
+        
+        if isinstance(web_outcome, asyncio.TimeoutError):
+            logger.warning(f"Web search exceeded {settings.WEB_SEARCH_TIMEOUT}s, continuing without web results")
+            metadata["search_results"]["web_timeout"] = True
+        elif isinstance(web_outcome, BaseException):
+            logger.error(f"Web search failed while building context: {web_outcome}")
+            metadata.setdefault("errors", []).append(str(web_outcome))
+        else:
+            web_results = web_outcome
+        
+        return messages, documents, doc_results, web_results
+    
+    async def _load_session_context(
+        self,
+        session_id: int,
+        user_message: str,
+        max_messages: int,
+        include_documents: bool
+    ) -> Tuple[List[Any], List[Any], List[Dict[str, Any]]]:
+        """Load history and documents, then search the loaded documents"""
+        messages, documents = await self._prefetch_session_state(session_id, max_messages, include_documents)
+        doc_results = []
+        if documents:
+            doc_results = await search_documents_async(
+                user_message, session_id, self.db, documents=documents
             )
-            messages = self.db.execute(statement).scalars().all()
-            
-            if not messages:
-                return ""
-            
-            # Reverse to get chronological order
-            messages = list(reversed(messages))
-            
-            history_parts = []
-            for msg in messages:
-                role = "You" if msg.sender == "user" else "Assistant"
-                history_parts.append(f"{role}: {msg.content}")
-            
-            return "\n".join(history_parts)
-            
-        except Exception as e:
-            logger.error(f"Failed to get conversation history: {e}")
-            return ""
+        return messages, documents, doc_results
+    
+    async def _prefetch_session_state(
+        self,
+        session_id: int,
+        max_messages: int,
+        include_documents: bool
+    ) -> Tuple[List[Any], List[Any]]:
+        """Load recent transcript lines (oldest first) and session document previews, each in a single query"""
+        messages = []
+        documents = []
+        
+        if max_messages > 0:
+            try:
+                messages = await self._get_history_lines(session_id, max_messages)
+            except Exception as e:
+                logger.error(f"Failed to get conversation history: {e}")
+        
+        if include_documents:
+            try:
+                documents = await get_document_previews_async(self.db, session_id)
+            except Exception as e:
+                logger.error(f"Failed to get session documents: {e}")
+        
+        return messages, documents
+    
+    async def _get_history_lines(self, session_id: int, max_messages: int) -> List[str]:
+        """Rendered lines for the newest max_messages messages, fetching only rows not cached yet"""
+        capacity = max(HISTORY_CACHE_MESSAGES, max_messages)
+        last_id, lines, complete = _HISTORY_CACHE.get(session_id, (0, (), False))
+        
+        if len(lines) < max_messages and not complete:
+            # Cold or too shallow for this request: load the newest tail
+            result = await self.db.execute(_recent_messages_statement(session_id, max_messages))
+            rows = result.all()
+            lines = tuple(_render_message(row.sender, row.content) for row in rows)
+            complete = len(rows) < max_messages
+        else:
+            result = await self.db.execute(_recent_messages_statement(session_id, capacity, after_id=last_id))
+            rows = result.all()
+            if rows:
+                lines += tuple(_render_message(row.sender, row.content) for row in rows)
+                if len(rows) == capacity or len(lines) > capacity:
+                    # Older rows may exist beyond what was just fetched
+                    lines = lines[-capacity:]
+                    complete = False
+        
+        if rows:
+            last_id = rows[-1].id
+        _history_cache_store(session_id, last_id, lines, complete)
+        return list(lines[-max_messages:])
+    
+    def _format_conversation_history(self, lines: List[str]) -> str:
+        """Join rendered transcript lines, oldest first"""
+        return "\n".join(lines)
     
     def _format_document_results(self, doc_results: List[Dict[str, Any]]) -> str:
         """Format document search results into context"""
@@ -194,7 +428,7 @@ class ContextBuilder:
         for doc in doc_results:
             # Extract information safely with defaults
             filename = doc.get('filename', 'Unknown Document')
-            snippet = doc.get('snippet', doc.get('text', 'No content available'))
+            snippet = _clip(doc.get('snippet', doc.get('text', 'No content available')))
             similarity_score = doc.get('similarity_score', 0.0)
             document_id = doc.get('document_id', None)
             
@@ -209,33 +443,29 @@ class ContextBuilder:
         
         return "\n".join(formatted_parts)
     
-    def _get_all_documents_for_context(self, session_id: int, max_docs: int = 3) -> str:
-        """Get all documents for broad context when no specific search results"""
-        try:
-            documents = get_documents_by_session(self.db, session_id)
-            if not documents:
-                return ""
-            
-            formatted_parts = ["=== SESSION DOCUMENTS ==="]
-            
-            for doc in documents[:max_docs]:
-                # Get a brief excerpt from the document
-                excerpt = doc.text[:200] + "..." if len(doc.text) > 200 else doc.text
-                formatted_parts.append(f"📄 {doc.filename}:\n{excerpt}\n")
-            
-            if len(documents) > max_docs:
-                formatted_parts.append(f"... and {len(documents) - max_docs} more documents")
-            
-            return "\n".join(formatted_parts)
-            
-        except Exception as e:
-            logger.error(f"Failed to get session documents: {e}")
+    def _format_session_documents(self, documents: List[Any], max_docs: int = 3) -> str:
+        """Format brief excerpts of session documents for broad context when no specific search results"""
+        if not documents:
             return ""
+        
+        formatted_parts = ["=== SESSION DOCUMENTS ==="]
+        
+        for doc in documents[:max_docs]:
+            # Get a brief excerpt from the document
+            excerpt = doc.text[:200] + "..." if len(doc.text) > 200 else doc.text
+            formatted_parts.append(f"📄 {doc.filename}:\n{excerpt}\n")
+        
+        # Previews carry the session's total document count
+        total = documents[0].total
+        if total > max_docs:
+            formatted_parts.append(f"... and {total - max_docs} more documents")
+        
+        return "\n".join(formatted_parts)
     
-    def _get_document_details(self, document_id: int) -> Dict[str, Any]:
+    async def _get_document_details(self, document_id: int) -> Dict[str, Any]:
         """Get detailed information about a specific document"""
         try:
-            document = get_document_by_id(self.db, document_id)
+            document = await self.db.get(Document, document_id)
             if document:
                 return {
                     "id": document.id,
@@ -249,10 +479,10 @@ class ContextBuilder:
             logger.error(f"Failed to get document details for ID {document_id}: {e}")
             return {}
     
-    def _enhance_context_with_document_details(self, context_parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _enhance_context_with_document_details(self, context_parts: List[ContextPart]) -> List[ContextPart]:
         """Enhance context parts with additional document details if needed"""
         for part in context_parts:
-            if part["type"] == "documents":
+            if part.type == "documents":
                 # Could add additional processing here
                 # For example, expanding snippets, adding metadata, etc.
                 pass
@@ -268,37 +498,35 @@ class ContextBuilder:
         for result in web_results:
             if result.get("title") != "Search Unavailable":
                 formatted_parts.append(
-                    f"🌐 {result['title']}:\n{result['snippet']}\n"
+                    f"🌐 {result['title']}:\n{_clip(result['snippet'])}\n"
                 )
         
         return "\n".join(formatted_parts)
     
     def _combine_context_parts(
         self, 
-        context_parts: List[Dict[str, Any]], 
+        context_parts: List[ContextPart], 
         user_message: str
     ) -> str:
         """Combine context parts within token limits"""
         
         # Sort by priority (lower number = higher priority)
-        context_parts.sort(key=lambda x: x["priority"])
+        context_parts.sort(key=lambda x: x.priority)
         
         combined_context = []
-        current_tokens = len(user_message.split()) * 1.3  # Rough token estimation
+        current_tokens = count_tokens(user_message)
         
         for part in context_parts:
-            part_tokens = len(part["content"].split()) * 1.3
-            
-            if current_tokens + part_tokens < self.max_context_tokens:
-                combined_context.append(part["content"])
-                current_tokens += part_tokens
+            if current_tokens + part.token_count < self.max_context_tokens:
+                combined_context.append(part.content)
+                current_tokens += part.token_count
             else:
                 # Try to fit a truncated version
                 remaining_tokens = self.max_context_tokens - current_tokens - 100  # Buffer
                 if remaining_tokens > 50:
                     truncated = trim_text_to_token_limit(
-                        part["content"], 
-                        int(remaining_tokens / 1.3)
+                        part.content, 
+                        remaining_tokens
                     )
                     combined_context.append(truncated + "\n[Content truncated...]")
                 break
@@ -314,22 +542,13 @@ class ContextBuilder:
     ) -> str:
         """Apply selected reasoning technique to the context and user message"""
         try:
-            available_tools = ["web_search", "document_search", "calculation", "analysis"]
-            
             logger.info(f"Applying reasoning type: {reasoning_type.value}")
 
-            if reasoning_type == ReasoningType.CHAIN_OF_THOUGHT:
-                return chain_of_thought_reasoning(context, user_message, question_type)
-            elif reasoning_type == ReasoningType.REACT:
-                return react_reasoning(context, user_message, available_tools)
-            elif reasoning_type == ReasoningType.HYBRID:
-                return hybrid_reasoning(context, user_message, available_tools)
-            else:
+            reasoner = _REASONERS.get(reasoning_type)
+            if reasoner is None:
                 logger.warning(f"Unknown reasoning type: {reasoning_type}")
-                return chain_of_thought_reasoning(context, user_message, question_type)
-            
-            logger.info(f"Reasoning result generated: {reasoning_result[:200]}...")  # Log first 200 chars
-            return reasoning_result
+                reasoner = _REASONERS[ReasoningType.CHAIN_OF_THOUGHT]
+            return reasoner(context, user_message, question_type)
                 
         except Exception as e:
             logger.error(f"Failed to apply reasoning: {e}")
@@ -337,7 +556,7 @@ class ContextBuilder:
 
 # Enhanced functions with reasoning support
 async def build_context_with_reasoning(
-    db: Session, 
+    db: AsyncSession, 
     session_id: int, 
     user_message: str,
     reasoning_type: ReasoningType = ReasoningType.HYBRID
@@ -348,54 +567,34 @@ async def build_context_with_reasoning(
     builder = ContextBuilder(db, enable_reasoning=True, reasoning_type=reasoning_type)
     return await builder.build_context(session_id, user_message)
 
-async def build_context_with_cot(db: Session, session_id: int, user_message: str) -> Dict[str, Any]:
+async def build_context_with_cot(db: AsyncSession, session_id: int, user_message: str) -> Dict[str, Any]:
     """Build context with Chain of Thought reasoning"""
     return await build_context_with_reasoning(db, session_id, user_message, ReasoningType.CHAIN_OF_THOUGHT)
 
-async def build_context_with_react(db: Session, session_id: int, user_message: str) -> Dict[str, Any]:
+async def build_context_with_react(db: AsyncSession, session_id: int, user_message: str) -> Dict[str, Any]:
     """Build context with ReAct reasoning"""
     return await build_context_with_reasoning(db, session_id, user_message, ReasoningType.REACT)
 
-async def build_context_with_hybrid(db: Session, session_id: int, user_message: str) -> Dict[str, Any]:
+async def build_context_with_hybrid(db: AsyncSession, session_id: int, user_message: str) -> Dict[str, Any]:
     """Build context with Hybrid reasoning"""
     return await build_context_with_reasoning(db, session_id, user_message, ReasoningType.HYBRID)
 
 # Legacy functions for backward compatibility
-def retrieve_context(db: Session, session_id: int, query_embedding: list[float]) -> str:
-    """
-    Retrieve the most relevant documents and messages using semantic search.
-    """
-    if not query_embedding:
-        raise ValueError("query_embedding cannot be empty")
-
-    # Convert query_embedding to a string representation of an array
-    query_embedding_str = "ARRAY[" + ",".join(map(str, query_embedding)) + "]::vector"
-
-    try:
-        results = db.execute(
-            text(
-                f"""
-                SELECT text
-                FROM embedding
-                WHERE session_id = :session_id
-                ORDER BY embedding <-> {query_embedding_str}
-                LIMIT 5
-                """
-            ),
-            {"session_id": session_id}
-        ).fetchall()
-        return "\n\n".join([row["text"] for row in results])
-    except Exception as e:
-        logger.error(f"Semantic search failed: {e}")
-        return ""
-
 def get_recent_messages(db: Session, session_id: int, limit=10) -> list[Message]:
-    statement = select(Message).where(Message.session_id == session_id).order_by(Message.timestamp.desc()).limit(limit)
-    results = db.execute(statement).scalars().all()
-    return list(reversed(results))  # Oldest first
+    # Take the newest rows in a subquery and let the DB return them oldest first
+    recent = (
+        select(Message)
+        .where(Message.session_id == session_id)
+        .order_by(Message.timestamp.desc())
+        .limit(limit)
+        .subquery()
+    )
+    recent_message = aliased(Message, recent)
+    statement = select(recent_message).order_by(recent_message.timestamp.asc())
+    return db.execute(statement).scalars().all()
 
 async def build_context(
-    db: Session, 
+    db: AsyncSession, 
     session_id: int, 
     user_message: str, 
     enable_reasoning: bool = True,
@@ -408,18 +607,7 @@ async def build_context(
     result = await builder.build_context(session_id, user_message)
     return result["context"]
 
-def build_prompt(
-    context: str, 
-    user_message: str, 
-    system_prompt: str = None, 
-    db: Session = None,
-    reasoning_output: str = None
-) -> str:
-    """
-    Build the final prompt for the LLM, incorporating feedback patterns, system guidance, and reasoning.
-    """
-    if system_prompt is None:
-        system_prompt = """You are SynthesisTalk, an intelligent research assistant with advanced reasoning capabilities. You help users by:
+SYSTEM_PROMPT = """You are SynthesisTalk, an intelligent research assistant with advanced reasoning capabilities. You help users by:
 
 1. 📚 Analyzing uploaded documents and extracting key insights
 2. 🔍 Searching the web for current information when needed
@@ -436,13 +624,22 @@ When responding:
 - Offer to search for additional information if needed
 - Maintain conversation context and remember previous discussions"""
 
-    # Analyze feedback patterns if db is provided
-    avoid_phrases = []
-    encourage_phrases = []
-    if db:
-        feedback_patterns = analyze_feedback(db)
-        avoid_phrases = [word for word, count in feedback_patterns["thumbs_down"] if count > 2]  # Avoid frequent negative patterns
-        encourage_phrases = [word for word, count in feedback_patterns["thumbs_up"] if count > 2]  # Encourage frequent positive patterns
+def build_prompt(
+    context: str, 
+    user_message: str, 
+    system_prompt: str = None, 
+    db: Session = None,
+    reasoning_output: str = None
+) -> str:
+    """
+    Build the final prompt for the LLM, incorporating feedback patterns, system guidance, and reasoning.
+    """
+    if system_prompt is None:
+        system_prompt = SYSTEM_PROMPT
+
+    # Feedback notes (avoid frequent negative / encourage frequent positive patterns)
+    # come pre-rendered from the TTL-cached feedback snapshot
+    avoid_note, encourage_note = feedback_prompt_notes_cached(db) if db else ("", "")
 
     # Build the base prompt
     prompt_parts = [system_prompt]
@@ -456,13 +653,10 @@ When responding:
 
     prompt_parts.append(f"USER MESSAGE: {user_message}")
 
-    # Add a note to avoid certain phrases if necessary
-    if avoid_phrases:
-        prompt_parts.append("(Note: Avoid using the following phrases: " + ", ".join(avoid_phrases) + ")")
-
-    # Add a note to encourage certain phrases if necessary
-    if encourage_phrases:
-        prompt_parts.append("(Note: Consider using the following phrases: " + ", ".join(encourage_phrases) + ")")
+    if avoid_note:
+        prompt_parts.append(avoid_note)
+    if encourage_note:
+        prompt_parts.append(encourage_note)
 
     prompt_parts.append("RESPONSE:")
 
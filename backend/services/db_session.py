@@ -1,4 +1,10 @@
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from pgvector.psycopg2 import register_vector
+from pgvector.asyncpg import register_vector as register_vector_async
 from settings.settings import settings
 from models import db_models
 
@@ -8,18 +14,62 @@ if settings.DATABASE_URL:
 else:
     db_url = f"postgresql://{settings.USERNAME}:{settings.PASSWORD}@{settings.HOST}:{settings.PORT}/{settings.DB_NAME}"
 
+# DB_POOL_SIZE and DB_MAX_OVERFLOW are the budget for the whole process (small by
+# default to avoid hitting free-tier limits), split between the sync and async engines
+ASYNC_POOL_SIZE = max(1, settings.DB_POOL_SIZE // 2)
+SYNC_POOL_SIZE = max(1, settings.DB_POOL_SIZE - ASYNC_POOL_SIZE)
+ASYNC_MAX_OVERFLOW = settings.DB_MAX_OVERFLOW // 2
+SYNC_MAX_OVERFLOW = settings.DB_MAX_OVERFLOW - ASYNC_MAX_OVERFLOW
+
 engine = create_engine(
     db_url,
-    echo=True,
-    pool_size=3,         # Lower pool size to avoid hitting free-tier limits
-    max_overflow=0,      # Do not allow more than pool_size connections
+    echo=settings.DEBUG,  # SQL statement logging only when debugging
+    pool_size=SYNC_POOL_SIZE,
+    max_overflow=SYNC_MAX_OVERFLOW,  # 0 means never more than pool_size connections
+    pool_pre_ping=True,   # Replace connections the server dropped while idle
+    pool_recycle=1800,    # Retire connections before provider idle timeouts
+)
+
+# Async engine (asyncpg) for request paths that must not block the event loop.
+# Any postgres:// or postgresql+driver:// URL is switched to asyncpg, and libpq's
+# sslmode query parameter, which asyncpg rejects, becomes its ssl connect argument
+async_db_url = make_url(db_url).set(drivername="postgresql+asyncpg")
+async_connect_args = {}
+if "sslmode" in async_db_url.query:
+    async_connect_args["ssl"] = async_db_url.query["sslmode"]
+    async_db_url = async_db_url.difference_update_query(["sslmode"])
+
+async_engine = create_async_engine(
+    async_db_url,
+    echo=settings.DEBUG,
+    connect_args=async_connect_args,
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=ASYNC_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=1800,
 )
 
+# Register the pgvector adapters on every new DBAPI connection so vectors are
+# passed as bound parameters instead of being inlined into SQL text
+@event.listens_for(engine, "connect")
+def _register_vector(dbapi_connection, connection_record):
+    register_vector(dbapi_connection)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_async(dbapi_connection, connection_record):
+    dbapi_connection.run_async(register_vector_async)
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
+# expire_on_commit=False keeps loaded attributes usable after commit
+# instead of reloading every object with another SELECT
 def get_session():
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
 # Alias for backward compatibility and consistency
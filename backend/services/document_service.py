@@ -1,135 +1,200 @@
 from sqlmodel import Session, select
+from sqlalchemy import Row, func, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.db_models import Document, Embedding
-from services.embedding_service import generate_embedding
+from services.embedding_service import generate_embedding_cached, generate_embeddings_batch_cached
+from utils.text_utils import chunk_text
+import asyncio
 import logging
-from typing import List, Dict, Any
 import numpy as np
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 def save_document(db: Session, session_id: int, filename: str, text: str) -> Document:
-    # Generate embedding for the document text
-    embedding_vector = generate_embedding(text)
-    if not embedding_vector:
+    # Embed the whole document and its chunks in one batched model call;
+    # chunk embeddings let searches be a pgvector lookup instead of re-scoring text.
+    # Going through the embedding cache skips the forward pass for chunks seen
+    # before, e.g. headers, license text and other boilerplate shared by uploads
+    chunks = chunk_text(text)
+    embedding_vector, *chunk_vectors = generate_embeddings_batch_cached([text, *chunks])
+    if embedding_vector is None:
         logger.warning("Failed to generate embedding for document")
         raise ValueError("Embedding generation failed")
 
-    # Create and save the embedding
+    # Create the embedding, the document and its chunk embeddings in one transaction
     embedding = Embedding(session_id=session_id, text=text, embedding=embedding_vector)
     db.add(embedding)
-    db.commit()
-    db.refresh(embedding)
+    db.flush()
 
-    # Create and save the document with the embedding
     doc = Document(session_id=session_id, filename=filename, text=text, embedding_id=embedding.id)
     db.add(doc)
+    db.flush()
+    # Whole-document and chunk embeddings both point at the document, so searches
+    # join on document_id alone
+    embedding.document_id = doc.id
+
+    # Chunk rows go out as one batched multi-VALUES INSERT instead of one per chunk
+    chunk_rows = [
+        {"session_id": session_id, "document_id": doc.id, "text": chunk, "embedding": chunk_vector}
+        for chunk, chunk_vector in zip(chunks, chunk_vectors)
+        if chunk_vector is not None
+    ]
+    if chunk_rows:
+        db.execute(insert(Embedding), chunk_rows)
     db.commit()
-    db.refresh(doc)
+    # The flushes above already read ids back via INSERT ... RETURNING and every other
+    # column is set client-side; sessions keep attributes after commit
+    # (expire_on_commit=False), so no refresh SELECT is needed
 
     return doc
 
 def get_documents_text(db: Session, session_id: int) -> str:
-    statement = select(Document).where(Document.session_id == session_id)
-    docs = db.execute(statement).scalars().all()  # Use execute() and scalars() for SQLModel compatibility
-    return "\n\n".join([doc.text for doc in docs])
+    # Select only the text column and join straight from the result iterator
+    statement = select(Document.text).where(Document.session_id == session_id)
+    return "\n\n".join(db.execute(statement).scalars())
+
+# Cosine similarity threshold for a document to count as relevant
+SIMILARITY_THRESHOLD = 0.2
+
+def _nearest_chunks_statement(session_id: int, query_embedding: np.ndarray, limit: int):
+    """
+    Nearest stored embeddings for the session's documents by cosine distance:
+    the per-chunk embeddings plus each document's whole-text embedding
+    """
+    # The session's rows are materialized first and ranked exactly. The HNSW index
+    # would return only ef_search candidates from every session's embeddings before
+    # this filter runs, which often left too few rows or none at all.
+    session_embeddings = (
+        select(Embedding.document_id, Embedding.text, Embedding.embedding)
+        .where(Embedding.session_id == session_id, Embedding.document_id.is_not(None))
+        .cte("session_embeddings")
+        .prefix_with("MATERIALIZED")
+    )
+    distance = session_embeddings.c.embedding.cosine_distance(query_embedding)
+    return (
+        select(Document.id, Document.filename, session_embeddings.c.text, (1 - distance).label("score"))
+        .select_from(session_embeddings)
+        .join(Document, session_embeddings.c.document_id == Document.id)
+        .order_by(distance)
+        .limit(limit)
+    )
 
 async def search_documents(query: str, session_id: int, db: Session = None, top_k: int = 5) -> List[Dict[str, Any]]:
     """
     Search through documents using semantic similarity
     """
+    if not db:
+        from services.db_session import get_session
+        db = next(get_session())
+    
+    # The sync Session and the embedding model both block, so run the search on a worker thread
+    return await asyncio.to_thread(_search_documents_sync, query, session_id, db, top_k)
+
+def _search_documents_sync(query: str, session_id: int, db: Session, top_k: int) -> List[Dict[str, Any]]:
     try:
-        if not db:
-            from services.db_session import get_session
-            db = next(get_session())
-        
         # Generate embedding for the query
-        query_embedding = generate_embedding(query)
-        if not query_embedding:
+        query_embedding = generate_embedding_cached(query)
+        if query_embedding is None:
             logger.warning("Failed to generate embedding for query")
             return []
         
-        # Get all documents for the session
-        statement = select(Document).where(Document.session_id == session_id)
-        documents = db.execute(statement).scalars().all()
+        rows = db.execute(_nearest_chunks_statement(session_id, query_embedding, top_k * 4)).all()
+        return _rank_chunks(query, rows, top_k)
         
-        if not documents:
-            logger.info(f"No documents found for session_id: {session_id}")
+    except Exception as e:
+        logger.error(f"Document search failed: {e}")
+        return []
+
+async def search_documents_async(
+    query: str,
+    session_id: int,
+    db: AsyncSession,
+    top_k: int = 5,
+    documents: Optional[List[Document]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Search through documents using an AsyncSession so the event loop is not blocked.
+    Pass already loaded session documents to skip the search when there are none.
+    """
+    try:
+        if documents is not None and not documents:
             return []
         
-        # Simple text-based search as fallback if no embeddings
-        results = []
-        for doc in documents:
-            # Calculate simple text similarity (can be enhanced with embeddings)
-            similarity_score = calculate_text_similarity(query.lower(), doc.text.lower())
-            logger.debug(f"Document ID: {doc.id}, Similarity Score: {similarity_score}")
-            
-            if similarity_score > 0.1:  # Threshold for relevance
-                # Extract relevant snippet
-                snippet = extract_relevant_snippet(query, doc.text)
-                
-                results.append({
-                    "document_id": doc.id,
-                    "filename": doc.filename,
-                    "snippet": snippet,
-                    "similarity_score": similarity_score,
-                    "source": "document"
-                })
+        # Generate embedding for the query
+        query_embedding = await asyncio.to_thread(generate_embedding_cached, query)
+        if query_embedding is None:
+            logger.warning("Failed to generate embedding for query")
+            return []
         
-        # Sort by similarity score and return top results
-        results.sort(key=lambda x: x["similarity_score"], reverse=True)
-        logger.info(f"Total results found: {len(results)}")
-        return results[:top_k]
+        result = await db.execute(_nearest_chunks_statement(session_id, query_embedding, top_k * 4))
+        return _rank_chunks(query, result.all(), top_k)
         
     except Exception as e:
         logger.error(f"Document search failed: {e}")
         return []
 
-def calculate_text_similarity(query: str, text: str) -> float:
-    """
-    Simple text similarity calculation
-    Can be enhanced with more sophisticated NLP techniques
-    """
-    query_words = set(query.split())
-    text_words = set(text.split())
-    
-    if not query_words or not text_words:
-        return 0.0
-    
-    # Jaccard similarity
-    intersection = query_words.intersection(text_words)
-    union = query_words.union(text_words)
+def _rank_chunks(query: str, rows, top_k: int) -> List[Dict[str, Any]]:
+    """Keep the best-scoring chunk per document (rows arrive nearest first)"""
+    results = []
+    seen_documents = set()
+    for document_id, filename, chunk, similarity_score in rows:
+        if document_id in seen_documents or similarity_score <= SIMILARITY_THRESHOLD:
+            continue
+        seen_documents.add(document_id)
+        logger.debug(f"Document ID: {document_id}, Similarity Score: {similarity_score}")
+        
+        results.append({
+            "document_id": document_id,
+            "filename": filename,
+            "snippet": extract_relevant_snippet(query, chunk),
+            "similarity_score": float(similarity_score),
+            "source": "document"
+        })
+        if len(results) >= top_k:
+            break
     
-    return len(intersection) / len(union) if union else 0.0
+    logger.info(f"Total results found: {len(results)}")
+    return results
 
-def extract_relevant_snippet(query: str, text: str, max_length: int = 200) -> str:
+@lru_cache(maxsize=256)
+def _query_pattern(query: str) -> Optional[re.Pattern]:
+    """Compile one case-insensitive alternation of the query words"""
+    query_words = sorted(set(query.lower().split()), key=len, reverse=True)
+    if not query_words:
+        return None
+    return re.compile("|".join(map(re.escape, query_words)), re.IGNORECASE)
+
+def extract_relevant_snippet(query: str, text: str, max_length: int = 200, window_chars: int = 240) -> str:
     """
     Extract a relevant snippet from the text based on the query
     """
-    query_words = query.lower().split()
-    text_lower = text.lower()
-    
-    # Find the best position that contains most query words
-    best_pos = 0
-    best_score = 0
+    pattern = _query_pattern(query)
+    hits = [m.start() for m in pattern.finditer(text)] if pattern else []
     
-    words = text.split()
-    for i in range(len(words)):
-        # Check a window around position i
-        window_start = max(0, i - 20)
-        window_end = min(len(words), i + 20)
-        window_text = " ".join(words[window_start:window_end]).lower()
-        
-        # Count query words in this window
-        score = sum(1 for word in query_words if word in window_text)
-        
-        if score > best_score:
-            best_score = score
-            best_pos = window_start
+    if hits:
+        # Two-pointer sweep for the densest window of query-word hits
+        best_i, best_j = 0, 0
+        i = 0
+        for j in range(len(hits)):
+            while hits[j] - hits[i] > window_chars:
+                i += 1
+            if j - i > best_j - best_i:
+                best_i, best_j = i, j
+        start = max(0, hits[best_i] - 80)
+        end = hits[best_j] + 120
+        # Snap to whole words
+        if start > 0:
+            start = text.rfind(" ", 0, start) + 1
+    else:
+        start, end = 0, window_chars + 80
     
-    # Extract snippet around best position
-    snippet_start = max(0, best_pos - 10)
-    snippet_end = min(len(words), best_pos + 30)
-    snippet = " ".join(words[snippet_start:snippet_end])
+    if end < len(text):
+        space = text.find(" ", end)
+        end = space if space != -1 else len(text)
+    snippet = " ".join(text[start:end].split())
     
     # Truncate if too long
     if len(snippet) > max_length:
@@ -141,10 +206,28 @@ def get_document_by_id(db: Session, document_id: int) -> Document:
     """Get a specific document by ID"""
     return db.get(Document, document_id)
 
-def get_documents_by_session(db: Session, session_id: int) -> List[Document]:
-    """Get all documents for a session"""
-    statement = select(Document).where(Document.session_id == session_id)
-    return db.execute(statement).scalars().all()
+# Characters of text loaded per document for session-document excerpts
+DOCUMENT_PREVIEW_CHARS = 201
+
+async def get_document_previews_async(db: AsyncSession, session_id: int, limit: int = 3) -> List[Row]:
+    """
+    (id, filename, text, total) rows for up to limit session documents using an AsyncSession.
+    text is only the first DOCUMENT_PREVIEW_CHARS characters, cut by the database, and
+    total is the session's document count (the window runs before LIMIT).
+    """
+    statement = (
+        select(
+            Document.id,
+            Document.filename,
+            func.left(Document.text, DOCUMENT_PREVIEW_CHARS).label("text"),
+            func.count().over().label("total")
+        )
+        .where(Document.session_id == session_id)
+        .order_by(Document.id)
+        .limit(limit)
+    )
+    result = await db.execute(statement)
+    return result.all()
 
 def delete_document(db: Session, document_id: int) -> bool:
     """Delete a document"""
@@ -1,47 +1,229 @@
 from sqlmodel import Session
+from sqlalchemy import insert
 import logging
+import hashlib
+import os
+import threading
+import numpy as np
+import torch
+from collections import OrderedDict
+from typing import Optional
 from fastapi import HTTPException
 from sentence_transformers import SentenceTransformer
 from models.db_models import Embedding
+from settings.settings import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Run on the GPU when there is one; otherwise cap intra-op threads so encoding
+# does not oversubscribe the cores shared with the web workers
+EMBEDDING_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+if EMBEDDING_DEVICE == "cpu":
+    torch.set_num_threads(min(8, os.cpu_count() or 1))
+
+def _load_model() -> SentenceTransformer:
+    # The ONNX backend runs the int8-quantized export published with the model
+    # through onnxruntime, which is several times faster than FP32 torch on CPU
+    if settings.EMBEDDING_BACKEND == "onnx" and EMBEDDING_DEVICE == "cpu":
+        try:
+            return SentenceTransformer(
+                EMBEDDING_MODEL,
+                device=EMBEDDING_DEVICE,
+                backend="onnx",
+                model_kwargs={"file_name": settings.EMBEDDING_ONNX_FILE}
+            )
+        except Exception as e:
+            logger.error(f"Failed to load ONNX embedding model, falling back to torch: {e}")
+    model = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+    if EMBEDDING_DEVICE == "cuda":
+        # FP16 halves memory traffic; the precision loss is negligible for cosine search
+        model.half()
+    return model
+
 # Load the Hugging Face model globally to avoid reloading it for every request
-hf_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+hf_model = _load_model()
+logger.info(f"Embedding model loaded on {EMBEDDING_DEVICE}")
 
-def generate_embedding(text: str) -> list[float]:
+def _as_float32(vector) -> np.ndarray:
+    # FP16 on GPU and float32 on CPU both become float32, which pgvector stores
+    return np.asarray(vector, dtype=np.float32)
+
+def generate_embedding(text: str) -> Optional[np.ndarray]:
     """
     Generate an embedding for the given text using Hugging Face's SentenceTransformer.
+    Returns a float32 array, or None for empty input or on failure.
     """
-    logger.info(f"Generating embedding for text: {text}")
     if not text:
-        logger.warning("Input text is empty. Returning an empty embedding.")
-        return []
+        logger.warning("Input text is empty. Returning no embedding.")
+        return None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Generating embedding for text of length %d", len(text))
 
     try:
         # Generate embeddings using Hugging Face's model
-        embedding = hf_model.encode(text).tolist()
-        logger.info(f"Generated embedding: {embedding}")
-        return embedding
+        return _as_float32(hf_model.encode(
+            text, device=EMBEDDING_DEVICE, convert_to_numpy=True, normalize_embeddings=True
+        ))
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
-        return []
+        return None
+
+def generate_embeddings_batch(texts: list[str], batch_size: int = 64) -> list[Optional[np.ndarray]]:
+    """
+    Generate embeddings for several texts in one batched model call.
+    Returns one float32 array per input text, None for empty inputs or on failure.
+    """
+    # SentenceTransformer.encode already sorts by length internally to batch similar lengths
+    indices = [i for i, text in enumerate(texts) if text]
+    embeddings: list[Optional[np.ndarray]] = [None] * len(texts)
+    if not indices:
+        return embeddings
+
+    try:
+        vectors = _as_float32(hf_model.encode(
+            [texts[i] for i in indices],
+            batch_size=batch_size,
+            device=EMBEDDING_DEVICE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ))
+        for i, vector in zip(indices, vectors):
+            embeddings[i] = vector
+        logger.info(f"Generated {len(indices)} embeddings in one batch")
+    except Exception as e:
+        logger.error(f"Error generating batch embeddings: {e}")
+    return embeddings
+
+# Exact-match cache of embeddings keyed by a hash of the normalized text.
+# Values are read-only float32 arrays, so they can be handed out without copying
+# and callers can never mutate a cached entry.
+_EMB_CACHE: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+_EMB_CACHE_MAX = 10000
+_EMB_CACHE_LOCK = threading.Lock()
+_EMB_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.strip().lower().encode("utf-8"), digest_size=16).digest()
+
+def _cache_value(embedding: np.ndarray) -> np.ndarray:
+    embedding.setflags(write=False)
+    return embedding
+
+def generate_embedding_cached(text: str) -> Optional[np.ndarray]:
+    """
+    Return the embedding for the given text, reusing a previously computed one
+    for identical (whitespace/case-normalized) input. The array is read-only.
+    """
+    if not text:
+        return generate_embedding(text)
+
+    key = _cache_key(text)
+    with _EMB_CACHE_LOCK:
+        cached = _EMB_CACHE.get(key)
+        if cached is not None:
+            _EMB_CACHE.move_to_end(key)
+            _EMB_CACHE_STATS["hits"] += 1
+            return cached
+        _EMB_CACHE_STATS["misses"] += 1
+
+    embedding = generate_embedding(text)
+    if embedding is not None:
+        # Only cache successful encodings so transient failures are retried
+        with _EMB_CACHE_LOCK:
+            _EMB_CACHE[key] = _cache_value(embedding)
+            if len(_EMB_CACHE) > _EMB_CACHE_MAX:
+                _EMB_CACHE.popitem(last=False)
+    return embedding
+
+def generate_embeddings_batch_cached(texts: list[str]) -> list[Optional[np.ndarray]]:
+    """
+    Batched counterpart of generate_embedding_cached: cache hits are served directly
+    and all misses are encoded together in one model call.
+    """
+    keys = [_cache_key(text) if text else None for text in texts]
+    embeddings: list[Optional[np.ndarray]] = [None] * len(texts)
+    # Repeated texts within one call are encoded once: cache key -> input positions
+    misses: dict[bytes, list[int]] = {}
+    with _EMB_CACHE_LOCK:
+        for i, key in enumerate(keys):
+            if key is None:
+                continue
+            cached = _EMB_CACHE.get(key)
+            if cached is not None:
+                _EMB_CACHE.move_to_end(key)
+                _EMB_CACHE_STATS["hits"] += 1
+                embeddings[i] = cached
+            else:
+                _EMB_CACHE_STATS["misses"] += 1
+                misses.setdefault(key, []).append(i)
+
+    if misses:
+        positions = list(misses.values())
+        vectors = generate_embeddings_batch([texts[group[0]] for group in positions])
+        with _EMB_CACHE_LOCK:
+            for key, group, vector in zip(misses, positions, vectors):
+                if vector is None:
+                    continue
+                vector = _cache_value(vector)
+                _EMB_CACHE[key] = vector
+                for i in group:
+                    embeddings[i] = vector
+            while len(_EMB_CACHE) > _EMB_CACHE_MAX:
+                _EMB_CACHE.popitem(last=False)
+    return embeddings
+
+def embedding_cache_stats() -> dict:
+    """Return hit/miss counters and current size of the embedding cache"""
+    with _EMB_CACHE_LOCK:
+        return {**_EMB_CACHE_STATS, "size": len(_EMB_CACHE)}
+
+def store_embeddings_bulk(db: Session, session_id: int, texts: list[str]) -> list[int]:
+    """
+    Embed several texts (uncached ones in one batched model call) and store them in a single commit.
+    Texts that fail to embed are skipped. Returns the ids of the stored embeddings.
+    """
+    try:
+        vectors = generate_embeddings_batch_cached(texts)
+        rows = [
+            {"session_id": session_id, "text": text_content, "embedding": vector}
+            for text_content, vector in zip(texts, vectors)
+            if vector is not None
+        ]
+        if len(rows) < len(texts):
+            logger.warning(f"Skipped {len(texts) - len(rows)} texts with empty embeddings")
+        if not rows:
+            return []
+
+        # A list of parameter dicts runs as one batched multi-VALUES INSERT (insertmanyvalues)
+        ids = db.execute(insert(Embedding).returning(Embedding.id, sort_by_parameter_order=True), rows).scalars().all()
+        db.commit()
+
+        logger.info(f"Successfully stored {len(ids)} embeddings for session {session_id}")
+        return ids
+
+    except Exception as e:
+        logger.error(f"Error storing embeddings: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to store embeddings: {str(e)}")
 
 def store_embedding(db: Session, session_id: int, text_content: str):
     """
     Store text and its embedding in the database using SQLModel.
     """
     try:
-        embedding_vector = generate_embedding(text_content)
-        if not embedding_vector:
+        embedding_vector = generate_embedding_cached(text_content)
+        if embedding_vector is None:
             logger.warning(f"Empty embedding generated for text: {text_content[:50]}...")
             return None
 
         # Validate embedding vector
-        if not isinstance(embedding_vector, list) or len(embedding_vector) != 384:
-            logger.error(f"Invalid embedding vector: {embedding_vector}")
+        if embedding_vector.shape != (384,):
+            logger.error("Invalid embedding vector of shape %s", embedding_vector.shape)
             raise HTTPException(status_code=400, detail="Invalid embedding vector format")
 
         # Create new embedding record using SQLModel
@@ -53,7 +235,6 @@ def store_embedding(db: Session, session_id: int, text_content: str):
         
         db.add(embedding_record)
         db.commit()
-        db.refresh(embedding_record)
         
         logger.info(f"Successfully stored embedding for session {session_id}")
         return embedding_record.id
@@ -1,13 +1,63 @@
 import fitz
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from docx import Document as DocxDocument
 
+logger = logging.getLogger(__name__)
+
+# PDFs with at least this many pages are split across worker processes
+PARALLEL_PDF_MIN_PAGES = 32
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+_pdf_pool = None
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        # Spawned, not forked: the server process holds torch/OpenMP and
+        # to_thread worker threads whose locks a forked child could inherit held
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pdf_pool
+
+def shutdown_pdf_pool() -> None:
+    """Stop the PDF worker processes; called on application shutdown"""
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(cancel_futures=True)
+        _pdf_pool = None
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> str:
+    # Each worker opens its own Document: PyMuPDF objects must not be shared
+    # between threads, and get_text() holds the GIL, so processes are used
+    with fitz.open(path, filetype="pdf") as doc:
+        return "".join([doc.load_page(i).get_text() for i in range(start, stop)])
+
 def extract_text_from_pdf(file_bytes: bytes) -> str:
-    text = ""
     with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+        page_count = doc.page_count
+        if page_count < PARALLEL_PDF_MIN_PAGES or PDF_WORKERS < 2:
+            return "".join([page.get_text() for page in doc])
+
+    step = -(-page_count // PDF_WORKERS)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    # Workers open the PDF from a temporary file instead of each being sent the bytes
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(file_bytes)
+    try:
+        pool = _get_pdf_pool()
+        futures = [pool.submit(_extract_pdf_pages, tmp.name, start, stop) for start, stop in ranges]
+        return "".join([future.result() for future in futures])
+    except Exception as e:
+        logger.warning(f"Parallel PDF extraction failed, extracting sequentially: {e}")
+        return _extract_pdf_pages(tmp.name, 0, page_count)
+    finally:
+        os.unlink(tmp.name)
 
 def extract_text_from_txt(file_bytes: bytes) -> str:
     return file_bytes.decode("utf-8")
@@ -15,10 +65,7 @@ def extract_text_from_txt(file_bytes: bytes) -> str:
 def extract_text_from_docx(file_bytes: bytes) -> str:
     file_stream = BytesIO(file_bytes)
     doc = DocxDocument(file_stream)
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return "\n".join(full_text)
+    return "\n".join(para.text for para in doc.paragraphs)
 
 def extract_text_from_md(file_bytes: bytes) -> str:
     """Extract text from Markdown files."""
@@ -1,41 +1,78 @@
+import threading
+from collections import Counter
+from itertools import chain
+import time
 from sqlmodel import Session, select
+from sqlalchemy import text
 from models.db_models import Message
 
+# Feedback patterns change slowly, so prompt building reuses a snapshot for this long
+FEEDBACK_CACHE_TTL = 60  # seconds
+
+# Words seen more often than this in rated responses become prompt notes
+FEEDBACK_PHRASE_MIN_COUNT = 2
+
+_feedback_cache = {"notes": None, "expires_at": 0.0}
+_feedback_cache_lock = threading.Lock()
+
+# Most frequent words kept per rating when PostgreSQL does the counting
+FEEDBACK_TOP_WORDS = 500
+
+# Tokenize and count in the database so only (word, count) pairs come back
+_PG_WORD_COUNTS = {
+    rating: text(f"""
+        SELECT word, count(*) AS n
+        FROM message, regexp_split_to_table(lower(content), '\\s+') AS word
+        WHERE {rating} AND word <> ''
+        GROUP BY word
+        ORDER BY n DESC
+        LIMIT :limit
+    """)
+    for rating in ("thumbs_down", "thumbs_up")
+}
+
+def _word_counts(db: Session, rating: str):
+    """(word, count) pairs for messages with the given rating, most frequent first."""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_PG_WORD_COUNTS[rating], {"limit": FEEDBACK_TOP_WORDS}).all()
+        return [(word, count) for word, count in rows]
+
+    # Portable path: fetch only the content and count in C via Counter
+    contents = db.exec(select(Message.content).where(getattr(Message, rating) == True)).all()
+    return Counter(chain.from_iterable(content.lower().split() for content in contents)).most_common()
+
 def analyze_feedback(db: Session):
     """Analyze feedback to identify patterns in thumbs_down and thumbs_up responses."""
-    # Fetch all messages with thumbs_down
-    thumbs_down_messages = db.exec(
-        select(Message).where(Message.thumbs_down == True)
-    ).all()
-
-    # Fetch all messages with thumbs_up
-    thumbs_up_messages = db.exec(
-        select(Message).where(Message.thumbs_up == True)
-    ).all()
-
-    # Analyze patterns for thumbs_down
-    down_patterns = {}
-    for message in thumbs_down_messages:
-        content = message.content.lower()
-        for word in content.split():
-            down_patterns[word] = down_patterns.get(word, 0) + 1
-
-    # Analyze patterns for thumbs_up
-    up_patterns = {}
-    for message in thumbs_up_messages:
-        content = message.content.lower()
-        for word in content.split():
-            up_patterns[word] = up_patterns.get(word, 0) + 1
-
-    # Sort patterns by frequency
-    sorted_down_patterns = sorted(down_patterns.items(), key=lambda x: x[1], reverse=True)
-    sorted_up_patterns = sorted(up_patterns.items(), key=lambda x: x[1], reverse=True)
-
     return {
-        "thumbs_down": sorted_down_patterns,
-        "thumbs_up": sorted_up_patterns
+        "thumbs_down": _word_counts(db, "thumbs_down"),
+        "thumbs_up": _word_counts(db, "thumbs_up")
     }
 
+def _prompt_notes(patterns) -> tuple:
+    """Render the avoid/encourage prompt notes for a feedback snapshot."""
+    avoid = [word for word, count in patterns["thumbs_down"] if count > FEEDBACK_PHRASE_MIN_COUNT]
+    encourage = [word for word, count in patterns["thumbs_up"] if count > FEEDBACK_PHRASE_MIN_COUNT]
+    avoid_note = "(Note: Avoid using the following phrases: " + ", ".join(avoid) + ")" if avoid else ""
+    encourage_note = "(Note: Consider using the following phrases: " + ", ".join(encourage) + ")" if encourage else ""
+    return avoid_note, encourage_note
+
+def feedback_prompt_notes_cached(db: Session) -> tuple:
+    """Return the (avoid, encourage) prompt notes, recomputed at most once per FEEDBACK_CACHE_TTL."""
+    with _feedback_cache_lock:
+        if _feedback_cache["notes"] is not None and time.monotonic() < _feedback_cache["expires_at"]:
+            return _feedback_cache["notes"]
+
+    notes = _prompt_notes(analyze_feedback(db))
+    with _feedback_cache_lock:
+        _feedback_cache["notes"] = notes
+        _feedback_cache["expires_at"] = time.monotonic() + FEEDBACK_CACHE_TTL
+    return notes
+
+def invalidate_feedback_cache():
+    """Drop the cached feedback snapshot so the next prompt sees new feedback."""
+    with _feedback_cache_lock:
+        _feedback_cache["notes"] = None
+
 def log_feedback_analysis(db: Session):
     """Log feedback analysis results."""
     patterns = analyze_feedback(db)
@@ -2,8 +2,10 @@
 Advanced Reasoning Service for SynthesisTalk
 Implements Chain of Thought (CoT) and ReAct reasoning patterns
 """
+import bisect
 import logging
 import re
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 from enum import Enum
 from models.api_models import ReasoningType, QuestionType
@@ -11,142 +13,208 @@ from models.api_models import ReasoningType, QuestionType
 logger = logging.getLogger(__name__)
 
 
+# Keyword -> labels tables for the message classifiers. Matching is plain substring
+# containment on the lowercased message, as in the original per-list any() checks.
+_QUESTION_KEYWORDS = {
+    QuestionType.ANALYTICAL: ["analyze", "compare", "contrast", "evaluate", "assess", "why", "how", "explain"],
+    QuestionType.PROCEDURAL: ["how to", "step", "process", "procedure", "method", "guide"],
+    QuestionType.CREATIVE: ["create", "generate", "design", "brainstorm", "imagine", "suggest"],
+    QuestionType.COMPARATIVE: ["vs", "versus", "better", "difference", "similar", "compare"],
+}
+# First matching type wins, most specific first: "compare" reads as comparative and
+# "how to" as procedural even though both also contain analytical keywords
+_QUESTION_PRIORITY = (
+    QuestionType.COMPARATIVE,
+    QuestionType.PROCEDURAL,
+    QuestionType.CREATIVE,
+    QuestionType.ANALYTICAL,
+)
+
+_INTENT_KEYWORDS = {
+    "intent:guidance": ["help", "how", "guide"],
+    "intent:analysis": ["analyze", "compare", "evaluate"],
+}
+
+_TOOL_KEYWORDS = {
+    "web_search": ["current", "latest", "recent", "now", "today"],
+    "document_search": ["document", "file", "pdf", "text"],
+    "calculation": ["calculate", "compute", "math", "number"],
+}
+
+def _build_keyword_scanner(*tables: Dict[Any, List[str]]) -> Tuple[re.Pattern, Dict[str, frozenset]]:
+    """
+    Compile every keyword into one regex so a message is scanned once for all labels.
+    The lookahead reports a match at every position (the longest keyword starting there);
+    each keyword maps to the labels of all keywords it contains, so shorter keywords
+    hidden inside a longer match still count.
+    """
+    labels: Dict[str, set] = {}
+    for table in tables:
+        for label, keywords in table.items():
+            for keyword in keywords:
+                labels.setdefault(keyword, set()).add(label)
+    closure = {
+        keyword: frozenset().union(*(labels[other] for other in labels if other in keyword))
+        for keyword in labels
+    }
+    alternation = "|".join(map(re.escape, sorted(labels, key=len, reverse=True)))
+    return re.compile(f"(?=({alternation}))"), closure
+
+_KEYWORD_RE, _KEYWORD_LABELS = _build_keyword_scanner(_QUESTION_KEYWORDS, _INTENT_KEYWORDS, _TOOL_KEYWORDS)
+
+@lru_cache(maxsize=256)
+def _keyword_labels(user_message: str) -> frozenset:
+    """
+    All category/intent/tool labels whose keywords occur in the message.
+    One reasoning call classifies, analyzes intent and recommends tools for the
+    same message, so it is lowercased and scanned once and the labels are shared.
+    """
+    message_lower = user_message.lower()
+    return frozenset().union(*(_KEYWORD_LABELS[m.group(1)] for m in _KEYWORD_RE.finditer(message_lower)))
+
 def classify_question(user_message: str) -> QuestionType:
     """Classify the type of question to choose appropriate reasoning strategy"""
-    message_lower = user_message.lower()
-    
-    # Analytical keywords
-    analytical_keywords = ["analyze", "compare", "contrast", "evaluate", "assess", "why", "how", "explain"]
-    if any(keyword in message_lower for keyword in analytical_keywords):
-        return QuestionType.ANALYTICAL
-    
-    # Procedural keywords
-    procedural_keywords = ["how to", "step", "process", "procedure", "method", "guide"]
-    if any(keyword in message_lower for keyword in procedural_keywords):
-        return QuestionType.PROCEDURAL
-    
-    # Creative keywords
-    creative_keywords = ["create", "generate", "design", "brainstorm", "imagine", "suggest"]
-    if any(keyword in message_lower for keyword in creative_keywords):
-        return QuestionType.CREATIVE
-    
-    # Comparative keywords
-    comparative_keywords = ["vs", "versus", "better", "difference", "similar", "compare"]
-    if any(keyword in message_lower for keyword in comparative_keywords):
-        return QuestionType.COMPARATIVE
+    labels = _keyword_labels(user_message)
+    for question_type in _QUESTION_PRIORITY:
+        if question_type in labels:
+            return question_type
     
     # Default to factual
     return QuestionType.FACTUAL
 
+# Common stop words skipped when extracting concepts
+_STOP_WORDS = frozenset({"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"})
+_WORD_RE = re.compile(r'\b\w+\b')
+MAX_KEY_CONCEPTS = 10
+
+@lru_cache(maxsize=512)
+def _key_concepts(text: str) -> Tuple[str, ...]:
+    # Keep first-seen order and stop scanning once enough concepts are found
+    concepts: Dict[str, None] = {}
+    for match in _WORD_RE.finditer(text.lower()):
+        word = match.group()
+        if len(word) > 3 and word not in _STOP_WORDS:
+            concepts[word] = None
+            if len(concepts) == MAX_KEY_CONCEPTS:
+                break
+    return tuple(concepts)
+
 def extract_key_concepts(text: str) -> List[str]:
     """Extract key concepts from text for reasoning"""
-    # Remove common stop words and extract meaningful terms
-    stop_words = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"}
-    
     # Simple extraction - can be enhanced with NLP libraries
-    words = re.findall(r'\b\w+\b', text.lower())
-    key_concepts = [word for word in words if len(word) > 3 and word not in stop_words]
-    
-    # Return unique concepts, limited to most relevant
-    return list(set(key_concepts))[:10]
+    return list(_key_concepts(text))
+
+# Reasoning traces are mostly fixed text; only the marked fields vary per message
+_COT_TEMPLATE = """🎯 **Problem Analysis:**
+   - Question type: {question_type}
+   - Key concepts: {key_concepts}
+   - User intent: {intent}{context_block}
+
+🧠 **Reasoning Strategy for {question_type} question:**
+{strategy_block}
 
-def chain_of_thought_reasoning(context: str, user_message: str, question_type: Optional[QuestionType] = None) -> str:
+🔄 **Information Synthesis:**
+   - Combining context knowledge with question requirements
+   - Identifying gaps or areas needing clarification
+   - Structuring response for clarity and completeness"""
+
+_REACT_TEMPLATE = """🤔 **Thought 1: Problem Assessment**
+   The user is asking about: {key_concepts}
+   This appears to be a {question_type} question.
+
+🎯 **Action 1: Information Gathering**
+   Need to gather more information using: {tools}
+
+🤔 **Thought 2: Information Strategy**
+   Based on the question type, I should:
+{strategy_block}
+
+🔍 **Action 2: Information Processing**
+   - Analyzing available context and information
+   - Identifying key relationships and patterns
+   - Structuring information for comprehensive response
+
+🤔 **Thought 3: Response Strategy**
+   Now I can provide a comprehensive answer by:
+   - Using the processed information
+   - Addressing the specific question type
+   - Ensuring clarity and completeness"""
+
+def chain_of_thought_reasoning(
+    context: str,
+    user_message: str,
+    question_type: Optional[QuestionType] = None,
+    key_concepts: Optional[List[str]] = None,
+    context_insights: Optional[List[str]] = None
+) -> str:
     """
     Enhanced Chain of Thought reasoning with structured thinking process
     """
     if question_type is None:
         question_type = classify_question(user_message)
-    
-    key_concepts = extract_key_concepts(user_message)
-    
-    reasoning_steps = []
-    
-    # Step 1: Problem Understanding
-    reasoning_steps.append("🎯 **Problem Analysis:**")
-    reasoning_steps.append(f"   - Question type: {question_type.value}")
-    reasoning_steps.append(f"   - Key concepts: {', '.join(key_concepts[:5])}")
-    reasoning_steps.append(f"   - User intent: {_analyze_intent(user_message)}")
+    if key_concepts is None:
+        key_concepts = extract_key_concepts(user_message)
     
     # Step 2: Context Analysis
+    context_block = ""
     if context and context.strip():
-        reasoning_steps.append("\n📚 **Context Analysis:**")
-        context_insights = _analyze_context(context)
-        for insight in context_insights:
-            reasoning_steps.append(f"   - {insight}")
-    
-    # Step 3: Reasoning Strategy
-    reasoning_steps.append(f"\n🧠 **Reasoning Strategy for {question_type.value} question:**")
-    strategy_steps = _get_reasoning_strategy(question_type)
-    for step in strategy_steps:
-        reasoning_steps.append(f"   {step}")
+        if context_insights is None:
+            context_insights = _analyze_context(context)
+        context_block = "\n\n📚 **Context Analysis:**" + "".join(f"\n   - {insight}" for insight in context_insights)
     
-    # Step 4: Information Synthesis
-    reasoning_steps.append("\n🔄 **Information Synthesis:**")
-    reasoning_steps.append("   - Combining context knowledge with question requirements")
-    reasoning_steps.append("   - Identifying gaps or areas needing clarification")
-    reasoning_steps.append("   - Structuring response for clarity and completeness")
-    
-    return "\n".join(reasoning_steps)
+    return _COT_TEMPLATE.format(
+        question_type=question_type.value,
+        key_concepts=", ".join(key_concepts[:5]),
+        intent=_analyze_intent(user_message),
+        context_block=context_block,
+        strategy_block=_STRATEGY_BLOCKS.get(question_type, _STRATEGY_BLOCKS[QuestionType.FACTUAL])
+    )
 
-def react_reasoning(context: str, user_message: str, available_tools: Optional[List[str]] = None) -> str:
+def react_reasoning(
+    context: str,
+    user_message: str,
+    available_tools: Optional[List[str]] = None,
+    question_type: Optional[QuestionType] = None,
+    key_concepts: Optional[List[str]] = None
+) -> str:
     """
     Enhanced ReAct (Reasoning + Acting) with tool selection and iterative thinking
     """
     if available_tools is None:
         available_tools = ["web_search", "document_search", "analysis"]
     
-    question_type = classify_question(user_message)
-    key_concepts = extract_key_concepts(user_message)
-    
-    react_steps = []
-    
-    # Thought: Initial reasoning
-    react_steps.append("🤔 **Thought 1: Problem Assessment**")
-    react_steps.append(f"   The user is asking about: {', '.join(key_concepts[:3])}")
-    react_steps.append(f"   This appears to be a {question_type.value} question.")
-    
-    react_steps.append("\n🎯 **Action 1: Information Gathering**")
-    recommended_tools = _recommend_tools(user_message, available_tools)
-    react_steps.append(f"   Need to gather more information using: {', '.join(recommended_tools)}")
-        
-    react_steps.append("\n🤔 **Thought 2: Information Strategy**")
-    react_steps.append("   Based on the question type, I should:")
-    strategy = _get_information_strategy(question_type)
-    for step in strategy:
-        react_steps.append(f"   - {step}")
-    
-    # Action: Processing available information
-    react_steps.append("\n🔍 **Action 2: Information Processing**")
-    react_steps.append("   - Analyzing available context and information")
-    react_steps.append("   - Identifying key relationships and patterns")
-    react_steps.append("   - Structuring information for comprehensive response")
-    
-    # Thought: Final reasoning
-    react_steps.append("\n🤔 **Thought 3: Response Strategy**")
-    react_steps.append("   Now I can provide a comprehensive answer by:")
-    react_steps.append("   - Using the processed information")
-    react_steps.append("   - Addressing the specific question type")
-    react_steps.append("   - Ensuring clarity and completeness")
+    if question_type is None:
+        question_type = classify_question(user_message)
+    if key_concepts is None:
+        key_concepts = extract_key_concepts(user_message)
     
-    return "\n".join(react_steps)
+    return _REACT_TEMPLATE.format(
+        key_concepts=", ".join(key_concepts[:3]),
+        question_type=question_type.value,
+        tools=", ".join(_recommend_tools(user_message, available_tools)),
+        strategy_block=_INFO_STRATEGY_BLOCKS.get(question_type, _INFO_STRATEGY_BLOCKS[QuestionType.FACTUAL])
+    )
 
 def hybrid_reasoning(context: str, user_message: str, available_tools: Optional[List[str]] = None) -> str:
     """
     Combines CoT and ReAct for complex reasoning tasks
     """
+    # Analyze the message and context once and share the results with both phases
     question_type = classify_question(user_message)
+    key_concepts = extract_key_concepts(user_message)
+    context_insights = _analyze_context(context) if context and context.strip() else None
     
     # Use ReAct for information gathering and CoT for analysis
     if question_type in [QuestionType.FACTUAL, QuestionType.PROCEDURAL]:
         # Start with ReAct for gathering, then CoT for processing
-        react_part = react_reasoning(context, user_message, available_tools)
-        cot_part = chain_of_thought_reasoning(context, user_message, question_type)
+        react_part = react_reasoning(context, user_message, available_tools, question_type, key_concepts)
+        cot_part = chain_of_thought_reasoning(context, user_message, question_type, key_concepts, context_insights)
         
         return f"**🔄 HYBRID REASONING APPROACH**\n\n**Phase 1 - Information & Action Planning:**\n{react_part}\n\n**Phase 2 - Analytical Reasoning:**\n{cot_part}"
     else:
         # Start with CoT for analysis, then ReAct for validation
-        cot_part = chain_of_thought_reasoning(context, user_message, question_type)
-        react_part = react_reasoning(context, user_message, available_tools)
+        cot_part = chain_of_thought_reasoning(context, user_message, question_type, key_concepts, context_insights)
+        react_part = react_reasoning(context, user_message, available_tools, question_type, key_concepts)
         
         return f"**🔄 HYBRID REASONING APPROACH**\n\n**Phase 1 - Analytical Reasoning:**\n{cot_part}\n\n**Phase 2 - Action & Validation:**\n{react_part}"
 
@@ -155,64 +223,71 @@ def _analyze_intent(user_message: str) -> str:
     """Analyze user intent from message"""
     if "?" in user_message:
         return "Seeking information or explanation"
-    elif any(word in user_message.lower() for word in ["help", "how", "guide"]):
+    labels = _keyword_labels(user_message)
+    if "intent:guidance" in labels:
         return "Requesting assistance or guidance"
-    elif any(word in user_message.lower() for word in ["analyze", "compare", "evaluate"]):
+    elif "intent:analysis" in labels:
         return "Requesting analysis or evaluation"
     else:
         return "General inquiry or discussion"
 
+_RICHNESS_CUTOFFS = (300, 1000)
+_RICHNESS_LEVELS = (
+    "Limited context available",
+    "Moderate context available",
+    "Rich context available with detailed information",
+)
+
+# Source markers written by the context builder, in reporting order
+_CONTEXT_MARKER_INSIGHTS = {
+    "===": "Multiple information sources present",
+    "📄": "Document-based information available",
+    "🌐": "Web-based information available",
+}
+_CONTEXT_MARKERS = re.compile("|".join(map(re.escape, _CONTEXT_MARKER_INSIGHTS)))
+
 def _analyze_context(context: str) -> List[str]:
     """Analyze context and extract key insights"""
-    insights = []
+    # Contexts longer than each cutoff move up one richness level
+    insights = [_RICHNESS_LEVELS[bisect.bisect_left(_RICHNESS_CUTOFFS, len(context))]]
     
-    if len(context) > 1000:
-        insights.append("Rich context available with detailed information")
-    elif len(context) > 300:
-        insights.append("Moderate context available")
-    else:
-        insights.append("Limited context available")
-    
-    # Check for different types of content
-    if "===" in context:
-        insights.append("Multiple information sources present")
-    if "📄" in context:
-        insights.append("Document-based information available")
-    if "🌐" in context:
-        insights.append("Web-based information available")
+    # Check for different types of content in one pass
+    markers = set(_CONTEXT_MARKERS.findall(context))
+    insights.extend(insight for marker, insight in _CONTEXT_MARKER_INSIGHTS.items() if marker in markers)
     
     return insights
 
-def _get_reasoning_strategy(question_type: QuestionType) -> List[str]:
+_REASONING_STRATEGIES: Dict[QuestionType, Tuple[str, ...]] = {
+    QuestionType.FACTUAL: (
+        "1. Identify specific facts needed",
+        "2. Cross-reference available information",
+        "3. Provide accurate, verified information"
+    ),
+    QuestionType.ANALYTICAL: (
+        "1. Break down the problem into components",
+        "2. Analyze relationships and patterns",
+        "3. Synthesize insights and conclusions"
+    ),
+    QuestionType.PROCEDURAL: (
+        "1. Identify the goal or outcome",
+        "2. Break down into sequential steps",
+        "3. Provide clear, actionable instructions"
+    ),
+    QuestionType.CREATIVE: (
+        "1. Generate multiple perspectives",
+        "2. Combine ideas in novel ways",
+        "3. Provide innovative solutions"
+    ),
+    QuestionType.COMPARATIVE: (
+        "1. Identify comparison criteria",
+        "2. Analyze similarities and differences",
+        "3. Provide balanced evaluation"
+    )
+}
+
+def _get_reasoning_strategy(question_type: QuestionType) -> Tuple[str, ...]:
     """Get reasoning strategy based on question type"""
-    strategies = {
-        QuestionType.FACTUAL: [
-            "1. Identify specific facts needed",
-            "2. Cross-reference available information",
-            "3. Provide accurate, verified information"
-        ],
-        QuestionType.ANALYTICAL: [
-            "1. Break down the problem into components",
-            "2. Analyze relationships and patterns",
-            "3. Synthesize insights and conclusions"
-        ],
-        QuestionType.PROCEDURAL: [
-            "1. Identify the goal or outcome",
-            "2. Break down into sequential steps",
-            "3. Provide clear, actionable instructions"
-        ],
-        QuestionType.CREATIVE: [
-            "1. Generate multiple perspectives",
-            "2. Combine ideas in novel ways",
-            "3. Provide innovative solutions"
-        ],
-        QuestionType.COMPARATIVE: [
-            "1. Identify comparison criteria",
-            "2. Analyze similarities and differences",
-            "3. Provide balanced evaluation"
-        ]
-    }
-    return strategies.get(question_type, strategies[QuestionType.FACTUAL])
+    return _REASONING_STRATEGIES.get(question_type, _REASONING_STRATEGIES[QuestionType.FACTUAL])
 
 def _assess_context_sufficiency(context: str, user_message: str) -> bool:
     """Assess if available context is sufficient for the question"""
@@ -228,50 +303,43 @@ def _assess_context_sufficiency(context: str, user_message: str) -> bool:
 
 def _recommend_tools(user_message: str, available_tools: List[str]) -> List[str]:
     """Recommend tools based on user message"""
-    recommendations = []
-    message_lower = user_message.lower()
-    
-    if any(word in message_lower for word in ["current", "latest", "recent", "now", "today"]):
-        if "web_search" in available_tools:
-            recommendations.append("web_search")
-    
-    if any(word in message_lower for word in ["document", "file", "pdf", "text"]):
-        if "document_search" in available_tools:
-            recommendations.append("document_search")
-    
-    if any(word in message_lower for word in ["calculate", "compute", "math", "number"]):
-        if "calculation" in available_tools:
-            recommendations.append("calculation")
+    labels = _keyword_labels(user_message)
+    recommendations = [tool for tool in _TOOL_KEYWORDS if tool in labels and tool in available_tools]
     
     return recommendations if recommendations else ["web_search"]
 
-def _get_information_strategy(question_type: QuestionType) -> List[str]:
+_INFO_STRATEGIES: Dict[QuestionType, Tuple[str, ...]] = {
+    QuestionType.FACTUAL: (
+        "Search for authoritative sources",
+        "Verify information accuracy",
+        "Get the most current data"
+    ),
+    QuestionType.ANALYTICAL: (
+        "Gather comprehensive background information",
+        "Look for multiple perspectives",
+        "Find relevant case studies or examples"
+    ),
+    QuestionType.PROCEDURAL: (
+        "Find step-by-step guides",
+        "Look for best practices",
+        "Search for common pitfalls to avoid"
+    ),
+    QuestionType.CREATIVE: (
+        "Gather inspiration from various sources",
+        "Look for innovative approaches",
+        "Find diverse examples and ideas"
+    ),
+    QuestionType.COMPARATIVE: (
+        "Gather information on all items being compared",
+        "Find standardized comparison criteria",
+        "Look for expert evaluations"
+    )
+}
+
+def _get_information_strategy(question_type: QuestionType) -> Tuple[str, ...]:
     """Get information gathering strategy based on question type"""
-    strategies = {
-        QuestionType.FACTUAL: [
-            "Search for authoritative sources",
-            "Verify information accuracy",
-            "Get the most current data"
-        ],
-        QuestionType.ANALYTICAL: [
-            "Gather comprehensive background information",
-            "Look for multiple perspectives",
-            "Find relevant case studies or examples"
-        ],
-        QuestionType.PROCEDURAL: [
-            "Find step-by-step guides",
-            "Look for best practices",
-            "Search for common pitfalls to avoid"
-        ],
-        QuestionType.CREATIVE: [
-            "Gather inspiration from various sources",
-            "Look for innovative approaches",
-            "Find diverse examples and ideas"
-        ],
-        QuestionType.COMPARATIVE: [
-            "Gather information on all items being compared",
-            "Find standardized comparison criteria",
-            "Look for expert evaluations"
-        ]
-    }
-    return strategies.get(question_type, strategies[QuestionType.FACTUAL])
\ No newline at end of file
+    return _INFO_STRATEGIES.get(question_type, _INFO_STRATEGIES[QuestionType.FACTUAL])
+
+# Strategy steps rendered once per question type for the reasoning templates
+_STRATEGY_BLOCKS = {qt: "\n".join(f"   {step}" for step in _get_reasoning_strategy(qt)) for qt in QuestionType}
+_INFO_STRATEGY_BLOCKS = {qt: "\n".join(f"   - {step}" for step in _get_information_strategy(qt)) for qt in QuestionType}
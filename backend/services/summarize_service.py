@@ -1,10 +1,18 @@
-from typing import List, Union
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Union
 import re
+import hashlib
 import asyncio
+import logging
+import threading
 from services.document_service import get_documents_text
-from llm_providers.llm_manager import get_llm_response
+from llm_providers.llm_manager import (
+    get_llm_response, get_llm_response_stream, ALL_PROVIDERS_FAILED_MESSAGE, LLMStreamInterrupted
+)
 from sqlmodel import Session
 
+logger = logging.getLogger(__name__)
+
 # Import extractor functions individually to handle potential import errors
 try:
     from services.extractor_service import extract_text_from_pdf
@@ -31,7 +39,76 @@ try:
 except ImportError:
     extract_text_from_rtf = None
 
-def generate_summary(
+def _decode_text(data: bytes) -> str:
+    # Plain-text fallback when no dedicated extractor is available
+    return data.decode('utf-8', errors='replace')
+
+# File type -> extractor, resolved once at import; None means not available
+_EXTRACTORS = {
+    'pdf': extract_text_from_pdf,
+    'txt': extract_text_from_txt or _decode_text,
+    'docx': extract_text_from_docx,
+    'md': extract_text_from_md or _decode_text,
+    'markdown': extract_text_from_md or _decode_text,
+    'rtf': extract_text_from_rtf,
+}
+
+# Extracted text of recent uploads keyed by a hash of the file bytes, so summarizing
+# the same file again (e.g. in another format) skips re-parsing it. Extraction runs
+# on worker threads, hence the lock.
+_EXTRACT_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_EXTRACT_CACHE_MAX = 32
+_EXTRACT_CACHE_LOCK = threading.Lock()
+
+def _extract_cached(extractor: Callable[[bytes], str], file_bytes: bytes, file_type: str) -> str:
+    key = (hashlib.blake2b(file_bytes, digest_size=16).digest(), file_type)
+    with _EXTRACT_CACHE_LOCK:
+        cached = _EXTRACT_CACHE.get(key)
+        if cached is not None:
+            _EXTRACT_CACHE.move_to_end(key)
+            return cached
+
+    text = extractor(file_bytes)
+    with _EXTRACT_CACHE_LOCK:
+        _EXTRACT_CACHE[key] = text
+        if len(_EXTRACT_CACHE) > _EXTRACT_CACHE_MAX:
+            _EXTRACT_CACHE.popitem(last=False)
+    return text
+
+def _extract_input_text(
+    input_data: Union[str, bytes],
+    db: Session,
+    session_id: int,
+    input_type: str,
+    file_type: str
+) -> str:
+    """Get the text to summarize from an uploaded file or the session's documents."""
+    if input_type == "file":
+        if not file_type:
+            raise ValueError("File type must be specified when input_type is 'file'.")
+
+        # Extract text based on file type
+        if file_type in _EXTRACTORS:
+            extractor = _EXTRACTORS[file_type]
+            if extractor is None:
+                raise ValueError(f"{file_type.upper()} extraction not available")
+            text = _extract_cached(extractor, input_data, file_type)
+        else:
+            # Try to decode as text for unknown file types
+            try:
+                text = input_data.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ValueError(f"Unsupported file type: {file_type}")
+
+    else:
+        if not db or not session_id:
+            raise ValueError("Database session and session ID are required for summarizing documents.")
+        # Fetch text from documents
+        text = get_documents_text(db, session_id)
+
+    return text
+
+async def generate_summary(
     input_data: Union[str, bytes], 
     format: str, 
     db: Session = None, 
@@ -53,50 +130,9 @@ def generate_summary(
     Returns:
         str: The generated summary.
     """
-    if input_type == "file":
-        if not file_type:
-            raise ValueError("File type must be specified when input_type is 'file'.")
-
-        # Extract text based on file type
-        if file_type in ['pdf']:
-            if extract_text_from_pdf:
-                text = extract_text_from_pdf(input_data)
-            else:
-                raise ValueError("PDF extraction not available")
-        elif file_type in ['txt']:
-            if extract_text_from_txt:
-                text = extract_text_from_txt(input_data)
-            else:
-                # Fallback for text files
-                text = input_data.decode('utf-8')
-        elif file_type in ['docx']:
-            if extract_text_from_docx:
-                text = extract_text_from_docx(input_data)
-            else:
-                raise ValueError("DOCX extraction not available")
-        elif file_type in ['md', 'markdown']:
-            if extract_text_from_md:
-                text = extract_text_from_md(input_data)
-            else:
-                # Fallback for markdown files
-                text = input_data.decode('utf-8')
-        elif file_type in ['rtf']:
-            if extract_text_from_rtf:
-                text = extract_text_from_rtf(input_data)
-            else:
-                raise ValueError("RTF extraction not available")
-        else:
-            # Try to decode as text for unknown file types
-            try:
-                text = input_data.decode('utf-8')
-            except:
-                raise ValueError(f"Unsupported file type: {file_type}")
-
-    elif input_type == "documents":
-        if not db or not session_id:
-            raise ValueError("Database session and session ID are required for summarizing documents.")
-        # Fetch text from documents
-        text = get_documents_text(db, session_id)
+    if input_type in ("file", "documents"):
+        # Text extraction and the document query block, so keep them off the event loop
+        text = await asyncio.to_thread(_extract_input_text, input_data, db, session_id, input_type, file_type)
     else:
         # Assume input_data is plain text
         text = input_data
@@ -105,128 +141,295 @@ def generate_summary(
     if not text or not text.strip():
         raise ValueError("No text content found to summarize")
 
-    # Generate summary based on the format
-    if format == "bullet":
-        return generate_bullet_summary(text)
-    elif format == "paragraph":
-        return generate_paragraph_summary(text)
-    elif format == "insight":
-        return generate_insight_summary(text)
-    else:
-        raise ValueError("Unsupported summary format. Choose 'bullet', 'paragraph', or 'insight'.")
+    # A single format is the one-entry case of the multi-format path
+    return (await generate_summaries(text, [format]))[format]
 
-def generate_bullet_summary(text: str) -> str:
-    """Generate a bullet-point summary using LLM."""
+# Compiled once instead of looked up in re's pattern cache on every call
+_WS = re.compile(r'\s+')
+# Sentence bodies between terminators, matched lazily so long texts are not split up front
+_SENT = re.compile(r'[^.!?]+')
+# Matched case-insensitively so sentences need no lowercased copy
+_JUNK = re.compile(r'\s*(copyright|@|email|page \d+)', re.IGNORECASE)
+
+# Longest text sent to the LLM in one summary prompt
+SUMMARY_INPUT_CHARS = 4000
+# Longer texts are summarized section by section first (map), then the section
+# summaries are summarized in the requested format (reduce)
+MAP_CHUNK_CHARS = 3000
+MAP_CHUNK_OVERLAP = 200
+MAP_MAX_CHUNKS = 8
+MAP_CONCURRENCY = 4
+
+_MAP_PROMPT = """Please summarize the following section of a longer document in a few sentences. Keep the key points, names, figures and definitions. Ignore any copyright notices, headers, or metadata.
+
+Section:
+{text}
+
+Section summary:"""
+
+def _clean_text(text: str) -> str:
+    """Collapse whitespace and truncate the text for an LLM prompt."""
     # Clean the text to remove excessive whitespace
-    clean_text = re.sub(r'\s+', ' ', text.strip())
+    clean_text = _WS.sub(' ', text.strip())
     
     # Truncate text if too long (to avoid token limits)
-    if len(clean_text) > 4000:
-        clean_text = clean_text[:4000] + "..."
-    
-    prompt = f"""Please create a bullet-point summary of the following text. Focus on the key points and main ideas. Ignore any copyright notices, headers, or metadata. Return 5-7 bullet points starting with '•'.
+    if len(clean_text) > SUMMARY_INPUT_CHARS:
+        clean_text = clean_text[:SUMMARY_INPUT_CHARS] + "..."
+    return clean_text
 
-Text to summarize:
-{clean_text}
+def _split_windows(text: str) -> List[str]:
+    """Split text into overlapping windows, ending each at a sentence boundary when possible."""
+    windows = []
+    start = 0
+    while start < len(text) and len(windows) < MAP_MAX_CHUNKS:
+        end = start + MAP_CHUNK_CHARS
+        if end < len(text):
+            boundary = text.rfind(". ", start + MAP_CHUNK_CHARS // 2, end)
+            if boundary != -1:
+                end = boundary + 1
+        windows.append(text[start:end])
+        if end >= len(text):
+            break
+        start = end - MAP_CHUNK_OVERLAP
+    else:
+        if start < len(text):
+            logger.info(f"Summarizing the first {len(windows)} sections; the remaining text is skipped")
+    return windows
 
-Summary (bullet points):"""
+async def _prepare_llm_input(text: str) -> str:
+    """
+    Text for a summary prompt: short texts as is, long texts condensed by
+    summarizing their sections concurrently. Falls back to truncation on failure.
+    """
+    collapsed = _WS.sub(' ', text.strip())
+    if len(collapsed) <= SUMMARY_INPUT_CHARS:
+        return collapsed
+
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def summarize_section(section: str) -> str:
+        async with semaphore:
+            return await _cached_llm_response(_MAP_PROMPT.format(text=section))
 
     try:
-        # Get LLM response synchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        summary = loop.run_until_complete(get_llm_response(prompt))
-        loop.close()
-        
-        # Clean and format the response
-        if summary and summary.strip():
-            return summary.strip()
-        else:
-            return "• No meaningful content available for summary"
-            
+        partials = await asyncio.gather(*(summarize_section(w) for w in _split_windows(collapsed)))
+        if any(not p or p.startswith(ALL_PROVIDERS_FAILED_MESSAGE) for p in partials):
+            raise RuntimeError("section summary failed")
+        return _clean_text("\n".join(p.strip() for p in partials))
     except Exception as e:
-        # Fallback to simple text processing if LLM fails
-        return generate_simple_bullet_summary(clean_text)
+        logger.warning(f"Section summaries failed, truncating the text instead: {e}")
+        return _clean_text(collapsed)
 
-def generate_paragraph_summary(text: str) -> str:
-    """Generate a paragraph summary using LLM."""
-    # Clean the text
-    clean_text = re.sub(r'\s+', ' ', text.strip())
-    
-    # Truncate text if too long
-    if len(clean_text) > 4000:
-        clean_text = clean_text[:4000] + "..."
-    
-    prompt = f"""Please create a coherent paragraph summary of the following text. Focus on the main ideas and key concepts. Ignore any copyright notices, headers, or metadata. Write it as a flowing narrative summary in 3-4 sentences.
+# LRU cache of LLM replies keyed by a hash of the prompt, so re-summarizing the
+# same text in the same format skips the round-trip. Failed replies are not cached.
+_LLM_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_LLM_CACHE_MAX = 256
 
-Text to summarize:
-{clean_text}
+def _llm_cache_key(prompt: str) -> bytes:
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
 
-Summary (paragraph):"""
+def _llm_cache_get(key: bytes) -> Optional[str]:
+    cached = _LLM_CACHE.get(key)
+    if cached is not None:
+        _LLM_CACHE.move_to_end(key)
+    return cached
+
+def _llm_cache_put(key: bytes, response) -> None:
+    if isinstance(response, str) and response.strip() and not response.startswith(ALL_PROVIDERS_FAILED_MESSAGE):
+        _LLM_CACHE[key] = response
+        if len(_LLM_CACHE) > _LLM_CACHE_MAX:
+            _LLM_CACHE.popitem(last=False)
+
+async def _cached_llm_response(prompt: str) -> str:
+    key = _llm_cache_key(prompt)
+    cached = _llm_cache_get(key)
+    if cached is not None:
+        return cached
+
+    response = await get_llm_response(prompt)
+    _llm_cache_put(key, response)
+    return response
+
+class _SummaryFormat(NamedTuple):
+    """How one summary format is prompted, and formatted without the LLM"""
+    prompt: str
+    empty_message: str
+    fallback_fn: Callable[[str], str]
+    # Texts shorter than short_chars are formatted by short_fn without an LLM call;
+    # None for formats whose output must not just restate the input
+    short_fn: Optional[Callable[[str], str]] = None
+    short_chars: int = 0
 
+async def _summarize_with_llm(text: str, format: str) -> str:
+    """Prepare the text, ask the LLM, and fall back to simple processing on failure."""
+    spec = _SUMMARY_FORMATS[format]
+    clean_text = _clean_text(text)
+    if spec.short_fn is not None and len(clean_text) < spec.short_chars:
+        return spec.short_fn(clean_text) or spec.empty_message
+    
     try:
-        # Get LLM response synchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        summary = loop.run_until_complete(get_llm_response(prompt))
-        loop.close()
+        summary = await _cached_llm_response(spec.prompt.format(text=await _prepare_llm_input(text)))
         
         # Clean and format the response
         if summary and summary.strip():
             return summary.strip()
         else:
-            return "No meaningful content available for summary."
+            return spec.empty_message
             
     except Exception as e:
         # Fallback to simple text processing if LLM fails
-        return generate_simple_paragraph_summary(clean_text)
+        return spec.fallback_fn(clean_text)
 
-def generate_insight_summary(text: str) -> str:
-    """Generate insights using LLM."""
-    # Clean the text
-    clean_text = re.sub(r'\s+', ' ', text.strip())
-    
-    # Truncate text if too long
-    if len(clean_text) > 4000:
-        clean_text = clean_text[:4000] + "..."
-    
-    prompt = f"""Please extract 3-5 key insights from the following text. Focus on important concepts, definitions, principles, or main ideas. Ignore any copyright notices, headers, or metadata. Format as numbered insights (1., 2., 3., etc.).
+_BULLET_PROMPT = """Please create a bullet-point summary of the following text. Focus on the key points and main ideas. Ignore any copyright notices, headers, or metadata. Return 5-7 bullet points starting with '•'.
+
+Text to summarize:
+{text}
+
+Summary (bullet points):"""
+
+_PARAGRAPH_PROMPT = """Please create a coherent paragraph summary of the following text. Focus on the main ideas and key concepts. Ignore any copyright notices, headers, or metadata. Write it as a flowing narrative summary in 3-4 sentences.
+
+Text to summarize:
+{text}
+
+Summary (paragraph):"""
+
+_INSIGHT_PROMPT = """Please extract 3-5 key insights from the following text. Focus on important concepts, definitions, principles, or main ideas. Ignore any copyright notices, headers, or metadata. Format as numbered insights (1., 2., 3., etc.).
 
 Text to analyze:
-{clean_text}
+{text}
 
 Key insights:"""
 
+# Bullet lists of texts shorter than this (in characters) are just their
+# sentences, so they are formatted locally instead of going through an LLM
+# round-trip. Paragraphs and insights always go to the LLM: chat sends the
+# user's own message as the text, and echoing it back is not a summary
+SHORT_BULLET_CHARS = 200
+
+def _sentences_as_bullets(text: str) -> str:
+    sentences = (match.group().strip() for match in _SENT.finditer(text))
+    return "\n".join(f"• {sentence}" for sentence in sentences if sentence)
+
+async def generate_bullet_summary(text: str) -> str:
+    """Generate a bullet-point summary using LLM."""
+    return await _summarize_with_llm(text, "bullet")
+
+async def generate_paragraph_summary(text: str) -> str:
+    """Generate a paragraph summary using LLM."""
+    return await _summarize_with_llm(text, "paragraph")
+
+async def generate_insight_summary(text: str) -> str:
+    """Generate insights using LLM."""
+    return await _summarize_with_llm(text, "insight")
+
+# What each format should contain when several are requested in one call
+_FORMAT_INSTRUCTIONS = {
+    "bullet": "5-7 bullet points starting with '•', one per line",
+    "paragraph": "a coherent paragraph of 3-4 sentences covering the main ideas",
+    "insight": "3-5 numbered key insights (1., 2., 3., etc.), one per line",
+}
+
+_MULTI_FORMAT_PROMPT = """Please summarize the following text in several formats. Focus on the key points and main ideas. Ignore any copyright notices, headers, or metadata.
+
+Write each format under its own header line, exactly as shown, in this order:
+{instructions}
+
+Text to summarize:
+{text}"""
+
+# Section headers in the combined reply, e.g. "### BULLET ###"
+_SECTION_RE = re.compile(r'^\s*###\s*(BULLET|PARAGRAPH|INSIGHT)\s*###\s*$', re.IGNORECASE | re.MULTILINE)
+
+async def generate_summaries(text: str, formats: List[str]) -> Dict[str, str]:
+    """
+    Generate several summary formats of the same text with a single LLM call.
+
+    Args:
+        text (str): The text to summarize.
+        formats (List[str]): Formats to generate ('bullet', 'paragraph', 'insight').
+
+    Returns:
+        Dict[str, str]: The summary for each requested format.
+    """
+    formats = list(dict.fromkeys(formats))
+    unknown = [f for f in formats if f not in _SUMMARY_FORMATS]
+    if unknown:
+        raise ValueError("Unsupported summary format. Choose 'bullet', 'paragraph', or 'insight'.")
+    if len(formats) == 1:
+        return {formats[0]: await _summarize_with_llm(text, formats[0])}
+
+    instructions = "\n".join(f"### {f.upper()} ###\n{_FORMAT_INSTRUCTIONS[f]}" for f in formats)
+    summaries: Dict[str, str] = {}
     try:
-        # Get LLM response synchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        insights = loop.run_until_complete(get_llm_response(prompt))
-        loop.close()
-        
-        # Clean and format the response
-        if insights and insights.strip():
-            return insights.strip()
-        else:
-            return "1. No specific insights found in the text."
-            
+        reply = await _cached_llm_response(_MULTI_FORMAT_PROMPT.format(instructions=instructions, text=await _prepare_llm_input(text)))
+        # split() yields [preamble, name, body, name, body, ...]
+        parts = _SECTION_RE.split(reply)
+        for name, body in zip(parts[1::2], parts[2::2]):
+            name, body = name.lower(), body.strip()
+            if name in formats and body and name not in summaries:
+                summaries[name] = body
     except Exception as e:
-        # Fallback to simple text processing if LLM fails
-        return generate_simple_insight_summary(clean_text)
+        logger.warning(f"Combined summary failed, generating formats separately: {e}")
+
+    # Anything the combined reply did not cover goes through the single-format path
+    missing = [f for f in formats if f not in summaries]
+    if missing:
+        results = await asyncio.gather(*(_summarize_with_llm(text, f) for f in missing))
+        summaries.update(zip(missing, results))
+    return {f: summaries[f] for f in formats}
+
+async def stream_summary(text: str, format: str) -> AsyncIterator[str]:
+    """
+    Stream a summary in the specified format as the LLM generates it.
+
+    Args:
+        text (str): The text to summarize.
+        format (str): The format of the summary ('bullet', 'paragraph', 'insight').
+
+    Yields:
+        str: Pieces of the summary, in order.
+    """
+    if format not in _SUMMARY_FORMATS:
+        raise ValueError("Unsupported summary format. Choose 'bullet', 'paragraph', or 'insight'.")
+    if not text or not text.strip():
+        raise ValueError("No text content found to summarize")
+
+    prompt = _SUMMARY_FORMATS[format].prompt.format(text=await _prepare_llm_input(text))
+    key = _llm_cache_key(prompt)
+    cached = _llm_cache_get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    try:
+        async for chunk in get_llm_response_stream(prompt):
+            parts.append(chunk)
+            yield chunk
+    except LLMStreamInterrupted:
+        # The client already has a partial summary; end it there and keep it out of the cache
+        return
+    _llm_cache_put(key, "".join(parts).strip())
 
 # Fallback functions for when LLM is unavailable
+def _pick_sentences(text: str, min_words: int, limit: int) -> List[str]:
+    """First `limit` sentences with at least `min_words` words that are not boilerplate."""
+    # Fallbacks get _clean_text output, where words are separated by single spaces,
+    # so counting spaces gives the word count without building a list
+    min_spaces = min_words - 1
+    picked = []
+    for match in _SENT.finditer(text):
+        sentence = match.group().strip()
+        if sentence.count(' ') >= min_spaces and not _JUNK.match(sentence):
+            picked.append(sentence)
+            if len(picked) >= limit:
+                break
+    return picked
+
 def generate_simple_bullet_summary(text: str) -> str:
     """Simple fallback bullet summary without LLM."""
-    sentences = re.split(r'[.!?]+', text)
-    filtered_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if (len(sentence.split()) >= 4 and 
-            not re.search(r'^\s*(copyright|@|email|page \d+)', sentence.lower())):
-            filtered_sentences.append(sentence)
-            if len(filtered_sentences) >= 5:
-                break
+    filtered_sentences = _pick_sentences(text, min_words=4, limit=5)
     
     if not filtered_sentences:
         return "• No meaningful content available for summary"
@@ -235,16 +438,7 @@ def generate_simple_bullet_summary(text: str) -> str:
 
 def generate_simple_paragraph_summary(text: str) -> str:
     """Simple fallback paragraph summary without LLM."""
-    sentences = re.split(r'[.!?]+', text)
-    meaningful_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if (len(sentence.split()) >= 4 and 
-            not re.search(r'^\s*(copyright|@|email|page \d+)', sentence.lower())):
-            meaningful_sentences.append(sentence)
-            if len(meaningful_sentences) >= 3:
-                break
+    meaningful_sentences = _pick_sentences(text, min_words=4, limit=3)
     
     if not meaningful_sentences:
         return "No meaningful content available for summary."
@@ -253,18 +447,24 @@ def generate_simple_paragraph_summary(text: str) -> str:
 
 def generate_simple_insight_summary(text: str) -> str:
     """Simple fallback insight summary without LLM."""
-    sentences = re.split(r'[.!?]+', text)
-    insights = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if (len(sentence.split()) >= 5 and 
-            not re.search(r'^\s*(copyright|@|email|page \d+)', sentence.lower())):
-            insights.append(sentence)
-            if len(insights) >= 3:
-                break
+    insights = _pick_sentences(text, min_words=5, limit=3)
     
     if not insights:
         return "1. No specific insights found in the text."
     
-    return "\n".join(f"{i+1}. {insight}." for i, insight in enumerate(insights))
\ No newline at end of file
+    return "\n".join(f"{i+1}. {insight}." for i, insight in enumerate(insights))
+
+_SUMMARY_FORMATS: Dict[str, _SummaryFormat] = {
+    "bullet": _SummaryFormat(
+        _BULLET_PROMPT, "• No meaningful content available for summary",
+        generate_simple_bullet_summary, _sentences_as_bullets, SHORT_BULLET_CHARS
+    ),
+    "paragraph": _SummaryFormat(
+        _PARAGRAPH_PROMPT, "No meaningful content available for summary.",
+        generate_simple_paragraph_summary
+    ),
+    "insight": _SummaryFormat(
+        _INSIGHT_PROMPT, "1. No specific insights found in the text.",
+        generate_simple_insight_summary
+    ),
+}
@@ -2,6 +2,7 @@
 Unified Search Service
 Centralizes all search functionality to eliminate redundancy
 """
+import asyncio
 import logging
 from typing import Dict, List, Any, Optional
 from sqlmodel import Session
@@ -20,6 +21,7 @@ class SearchService:
     """Unified search service that handles all search operations"""
     
     def __init__(self):
+        self._providers_status: Optional[Dict[str, Any]] = None
         self.provider_functions = {
             "duckduckgo": search_web,
             "google": search_google_custom,
@@ -42,11 +44,12 @@ class SearchService:
             if priority_sources:
                 return await self._enforce_web_search(query, provider, num_results, priority_sources)
             
-            # Regular search
+            # Regular search (provider results are cached in services.web_search)
             search_func = self.provider_functions.get(provider, search_with_custom_api)
             raw_results = await search_func(query, num_results)
 
             # Format results to include title, link, and snippet
+            # (callers build their own "title (link)" source strings from these)
             formatted_results = [
                 {
                     "title": str(result.get("title", "No Title")),
@@ -55,12 +58,6 @@ class SearchService:
                 }
                 for result in raw_results
             ]
-
-            # Ensure sources_used are strings
-            sources_used = [
-                f"{result['title']} ({result['link']})"
-                for result in formatted_results
-            ]
             
             return {
                 "success": True,
@@ -132,17 +129,16 @@ class SearchService:
             "document_results": []
         }
         
-        # Web search
+        # Web and document searches are independent, so run them concurrently
+        searches = {}
         if include_web:
-            web_result = await self.web_search(query, web_provider, web_results_limit)
-            if web_result["success"]:
-                results["web_results"] = web_result["results"]
-        
-        # Document search
+            searches["web_results"] = self.web_search(query, web_provider, web_results_limit)
         if include_documents and session_id and db:
-            doc_result = await self.document_search(query, session_id, db)
-            if doc_result["success"]:
-                results["document_results"] = doc_result["results"]
+            searches["document_results"] = self.document_search(query, session_id, db)
+        
+        for key, result in zip(searches, await asyncio.gather(*searches.values())):
+            if result["success"]:
+                results[key] = result["results"]
         
         return {
             "success": True,
@@ -171,22 +167,33 @@ class SearchService:
         results = []
         used_provider = None
         
-        # Try providers in priority order
-        for prov in priority_sources:
-            if prov == provider or provider == "auto":
-                try:
-                    search_func = self.provider_functions.get(prov)
-                    if search_func:
-                        results = await search_func(query, num_results)
-                        used_provider = prov
-                        
-                        # Check if we got good results
-                        if results and len(results) > 0 and not all(r.get("title") == "Search Unavailable" for r in results):
-                            break
-                            
-                except Exception as e:
-                    logger.warning(f"Provider {prov} failed: {e}")
+        async def run_provider(prov: str, search_func):
+            try:
+                return prov, await search_func(query, num_results)
+            except Exception as e:
+                logger.warning(f"Provider {prov} failed: {e}")
+                return prov, []
+        
+        # Query the eligible providers concurrently; the first good answer wins
+        tasks = [
+            asyncio.create_task(run_provider(prov, self.provider_functions[prov]))
+            for prov in dict.fromkeys(priority_sources)
+            if (prov == provider or provider == "auto") and prov in self.provider_functions
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                prov, prov_results = await next_done
+                if not prov_results:
                     continue
+                
+                # Keep any non-empty answer, but only stop early on a good one
+                results, used_provider = prov_results, prov
+                if not all(r.get("title") == "Search Unavailable" for r in results):
+                    break
+        finally:
+            # Stop the slower providers once an answer is chosen
+            for task in tasks:
+                task.cancel()
         
         # Final fallback to DuckDuckGo
         if not results:
@@ -210,6 +217,12 @@ class SearchService:
         """
         Get available search providers and their status
         """
+        # Provider availability only depends on settings, so build it once
+        if self._providers_status is None:
+            self._providers_status = self._build_providers_status()
+        return self._providers_status
+    
+    def _build_providers_status(self) -> Dict[str, Any]:
         from settings.settings import settings
         
         providers = {
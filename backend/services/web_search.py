@@ -3,12 +3,109 @@ Web Search Service for retrieving current information from the internet
 """
 import asyncio
 import aiohttp
+import functools
+import json
 import logging
+import time
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from settings.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# orjson parses the multi-KB provider payloads several times faster than the
+# stdlib decoder; it is optional and json.loads is used when it is missing
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# One HTTP session for every search provider, so connections (and their TLS
+# handshakes and DNS lookups) are reused across requests
+_session: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+    return _session
+
+async def close_session() -> None:
+    """Close the shared HTTP session; called on application shutdown"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+# Provider results are reused for a while and concurrent identical queries share
+# one HTTP call. Only results a provider produced itself are kept: not empty lists,
+# "Search Unavailable" placeholders, or another provider's fallback results.
+SEARCH_CACHE_TTL = 600  # seconds
+SEARCH_CACHE_MAX = 1024
+_search_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+class _InflightSearch:
+    """A provider call shared by every caller waiting on the same query"""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+_inflight: Dict[tuple, _InflightSearch] = {}
+
+# Upper bound for search_with_custom_api racing the configured providers
+CUSTOM_SEARCH_TIMEOUT = 5  # seconds
+
+def _has_results(results: List[Dict[str, Any]]) -> bool:
+    return bool(results) and not all(r.get("title") == "Search Unavailable" for r in results)
+
+def _finish_search(key: tuple, source: str, task: asyncio.Task) -> None:
+    # Runs when the provider call ends, whether or not anyone is still waiting
+    _inflight.pop(key, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    results = task.result()
+    if results and all(str(r.get("source", "")).startswith(source) for r in results):
+        _search_cache[key] = (time.monotonic() + SEARCH_CACHE_TTL, tuple(results))
+        if len(_search_cache) > SEARCH_CACHE_MAX:
+            _search_cache.popitem(last=False)
+
+def _cached_search(source: str):
+    """Cache and coalesce a provider's searches; source is the prefix of its results' "source" field"""
+    def decorator(search_func):
+        @functools.wraps(search_func)
+        async def wrapper(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+            key = (search_func.__name__, " ".join(query.lower().split()), num_results)
+            cached = _search_cache.get(key)
+            if cached is not None:
+                if time.monotonic() < cached[0]:
+                    _search_cache.move_to_end(key)
+                    return list(cached[1])
+                del _search_cache[key]
+
+            inflight = _inflight.get(key)
+            if inflight is None:
+                task = asyncio.ensure_future(search_func(query, num_results))
+                inflight = _inflight[key] = _InflightSearch(task)
+                task.add_done_callback(functools.partial(_finish_search, key, source))
+            inflight.waiters += 1
+            try:
+                # Shield so one caller timing out does not cancel the search for the others
+                return list(await asyncio.shield(inflight.task))
+            finally:
+                inflight.waiters -= 1
+                # The last caller gave up (deadline or lost race): stop the HTTP call too
+                if inflight.waiters == 0 and not inflight.task.done():
+                    inflight.task.cancel()
+        return wrapper
+    return decorator
+
+@_cached_search("duckduckgo")
 async def search_web(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
     """
     Search the web using DuckDuckGo API (free alternative)
@@ -24,42 +121,41 @@ async def search_web(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
             "skip_disambig": "1"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Log raw response for debugging
-                    logger.debug(f"DuckDuckGo response: {data}")
-                    logger.debug(f"DuckDuckGo raw response: {data}")
-
-                    results = []
-                    
-                    # Extract instant answer if available
-                    if data.get("Abstract"):
+        session = _get_session()
+        async with session.get(url, params=params) as response:
+            if response.status == 200:
+                data = await response.json(loads=_json_loads)
+                
+                # Log raw response for debugging
+                logger.debug("DuckDuckGo response: %s", data)
+
+                results = []
+                
+                # Extract instant answer if available
+                if data.get("Abstract"):
+                    results.append({
+                        "title": data.get("Heading", "Instant Answer"),
+                        "url": data.get("AbstractURL", "Link not available"),
+                        "snippet": data.get("Abstract", ""),
+                        "source": "duckduckgo_instant"
+                    })
+
+                # Extract related topics
+                for topic in data.get("RelatedTopics", [])[:num_results-len(results)]:
+                    if isinstance(topic, dict) and "Text" in topic:
                         results.append({
-                            "title": data.get("Heading", "Instant Answer"),
-                            "url": data.get("AbstractURL", "Link not available"),
-                            "snippet": data.get("Abstract", ""),
-                            "source": "duckduckgo_instant"
+                            "title": topic.get("FirstURL", "").split("/")[-1].replace("_", " "),
+                            "url": topic.get("FirstURL", "Link not available"),
+                            "snippet": topic.get("Text", ""),
+                            "source": "duckduckgo_related"
                         })
-
-                    # Extract related topics
-                    for topic in data.get("RelatedTopics", [])[:num_results-len(results)]:
-                        if isinstance(topic, dict) and "Text" in topic:
-                            results.append({
-                                "title": topic.get("FirstURL", "").split("/")[-1].replace("_", " "),
-                                "url": topic.get("FirstURL", "Link not available"),
-                                "snippet": topic.get("Text", ""),
-                                "source": "duckduckgo_related"
-                            })
-                    
-                    # If we don't have enough results, that's ok - return what we have
-                    logger.info(f"Web search for '{query}' returned {len(results)} results")
-                    return results[:num_results]
-                else:
-                    logger.error(f"Web search API returned status {response.status}")
-                    return []
+                
+                # If we don't have enough results, that's ok - return what we have
+                logger.info("Web search for %r returned %d results", query, len(results))
+                return results[:num_results]
+            else:
+                logger.error(f"Web search API returned status {response.status}")
+                return []
     
     except Exception as e:
         logger.error(f"Web search failed: {e}")
@@ -76,14 +172,39 @@ async def search_with_custom_api(query: str, num_results: int = 5) -> List[Dict[
     Search using custom API if available (prioritized by reliability and cost)
     Configure in settings.py
     """
-    # Try APIs in order of preference
-    if hasattr(settings, 'GOOGLE_SEARCH_API_KEY') and settings.GOOGLE_SEARCH_API_KEY:
-        return await search_google_custom(query, num_results)
-    elif hasattr(settings, 'SERPAPI_API_KEY') and settings.SERPAPI_API_KEY:
-        return await search_serpapi(query, num_results)
-    else:
-        return await search_web(query, num_results)
+    # Race every configured provider and take the first usable answer, so a slow
+    # or failing primary no longer delays the fallbacks by its full timeout
+    providers = []
+    if getattr(settings, 'GOOGLE_SEARCH_API_KEY', None):
+        providers.append(search_google_custom)
+    if getattr(settings, 'SERPAPI_API_KEY', None):
+        providers.append(search_serpapi)
+    providers.append(search_web)
 
+    pending = {asyncio.create_task(provider(query, num_results)) for provider in providers}
+    fallback: List[Dict[str, Any]] = []
+    deadline = asyncio.get_running_loop().time() + CUSTOM_SEARCH_TIMEOUT
+    try:
+        while pending:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                logger.warning(f"Search providers timed out for '{query}'")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    logger.error(f"Search provider failed: {task.exception()}")
+                    continue
+                results = task.result()
+                if _has_results(results):
+                    return results
+                fallback = fallback or results
+        return fallback
+    finally:
+        for task in pending:
+            task.cancel()
+
+@_cached_search("google")
 async def search_google_custom(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
     """Google Custom Search API implementation"""
     try:
@@ -104,34 +225,34 @@ async def search_google_custom(query: str, num_results: int = 5) -> List[Dict[st
             "num": min(num_results, 10)  # Max 10 per request
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    results = []
-                    
-                    # Log raw response for debugging
-                    logger.debug(f"Google Custom Search response: {data}")
-                    logger.debug(f"Google Custom Search raw response: {data}")
-
-                    for item in data.get("items", []):
-                        results.append({
-                            "title": item.get("title", ""),
-                            "url": item.get("link", ""),
-                            "snippet": item.get("snippet", ""),
-                            "source": "google_custom"
-                        })
-                    
-                    logger.info(f"Google Custom Search for '{query}' returned {len(results)} results")
-                    return results
-                else:
-                    logger.error(f"Google Custom Search API returned status {response.status}")
-                    return await search_web(query, num_results)
+        session = _get_session()
+        async with session.get(url, params=params) as response:
+            if response.status == 200:
+                data = await response.json(loads=_json_loads)
+                results = []
+                
+                # Log raw response for debugging
+                logger.debug("Google Custom Search response: %s", data)
+
+                for item in data.get("items", []):
+                    results.append({
+                        "title": item.get("title", ""),
+                        "url": item.get("link", ""),
+                        "snippet": item.get("snippet", ""),
+                        "source": "google_custom"
+                    })
+                
+                logger.info("Google Custom Search for %r returned %d results", query, len(results))
+                return results
+            else:
+                logger.error(f"Google Custom Search API returned status {response.status}")
+                return await search_web(query, num_results)
     
     except Exception as e:
         logger.error(f"Google Custom Search failed: {e}")
         return await search_web(query, num_results)
 
+@_cached_search("serpapi")
 async def search_serpapi(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
     """SerpAPI Search implementation - Most reliable commercial option"""
     try:
@@ -146,29 +267,28 @@ async def search_serpapi(query: str, num_results: int = 5) -> List[Dict[str, Any
             "num": min(num_results, 10)
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    results = []
-                    
-                    # Log raw response for debugging
-                    logger.debug(f"SerpAPI response: {data}")
-                    logger.debug(f"SerpAPI raw response: {data}")
-
-                    for item in data.get("organic_results", []):
-                        results.append({
-                            "title": item.get("title", ""),
-                            "url": item.get("link", ""),
-                            "snippet": item.get("snippet", ""),
-                            "source": "serpapi"
-                        })
-                    
-                    logger.info(f"SerpAPI search for '{query}' returned {len(results)} results")
-                    return results
-                else:
-                    logger.error(f"SerpAPI returned status {response.status}")
-                    return await search_web(query, num_results)
+        session = _get_session()
+        async with session.get(url, params=params) as response:
+            if response.status == 200:
+                data = await response.json(loads=_json_loads)
+                results = []
+                
+                # Log raw response for debugging
+                logger.debug("SerpAPI response: %s", data)
+
+                for item in data.get("organic_results", []):
+                    results.append({
+                        "title": item.get("title", ""),
+                        "url": item.get("link", ""),
+                        "snippet": item.get("snippet", ""),
+                        "source": "serpapi"
+                    })
+                
+                logger.info("SerpAPI search for %r returned %d results", query, len(results))
+                return results
+            else:
+                logger.error(f"SerpAPI returned status {response.status}")
+                return await search_web(query, num_results)
     
     except Exception as e:
         logger.error(f"SerpAPI search failed: {e}")
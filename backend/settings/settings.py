@@ -1,33 +1,50 @@
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 class Settings(BaseSettings):
-    USERNAME: Optional[str]
-    PASSWORD: Optional[str]
-    HOST: Optional[str]
-    PORT: Optional[int]
-    DB_NAME: Optional[str]
-    DATABASE_URL: Optional[str]
-
-    OPENAI_API_KEY: Optional[str]
-    OPENAI_MODEL: Optional[str]
-
-    GROQ_API_KEY: Optional[str]
-    GROQ_BASE_URL: Optional[str]
-    GROQ_MODEL: Optional[str]
+    DEBUG: bool = False
+
+    USERNAME: Optional[str] = None
+    PASSWORD: Optional[str] = None
+    HOST: Optional[str] = None
+    PORT: Optional[int] = None
+    DB_NAME: Optional[str] = None
+    DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 3
+    DB_MAX_OVERFLOW: int = 0
+
+    OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: Optional[str] = None
+
+    GROQ_API_KEY: Optional[str] = None
+    GROQ_BASE_URL: Optional[str] = None
+    GROQ_MODEL: Optional[str] = None
     
-    NGU_API_KEY: Optional[str]
-    NGU_BASE_URL: Optional[str]
-    NGU_MODEL: Optional[str]
+    NGU_API_KEY: Optional[str] = None
+    NGU_BASE_URL: Optional[str] = None
+    NGU_MODEL: Optional[str] = None
+
+    GOOGLE_SEARCH_API_KEY: Optional[str] = None
+    GOOGLE_CSE_ID: Optional[str] = None
+    GOOGLE_URL: Optional[str] = None
+
+    SERPAPI_API_KEY: Optional[str] = None
+    SERPAPI_URL: Optional[str] = None
+
+    # Embedding model runtime: "torch", or "onnx" to run a quantized ONNX export on CPU
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_FILE: str = "onnx/model_qint8_avx2.onnx"
 
-    GOOGLE_SEARCH_API_KEY: Optional[str]
-    GOOGLE_CSE_ID: Optional[str]
-    GOOGLE_URL: Optional[str]
+    # Seconds to wait for web results before building context without them
+    WEB_SEARCH_TIMEOUT: float = 2.5
 
-    SERPAPI_API_KEY: Optional[str]
-    SERPAPI_URL: Optional[str]
+    # Settings are read-only after startup
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", frozen=True)
 
-    class Config:
-        env_file = ".env"
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the settings (reading .env) once per process"""
+    return Settings()
 
-settings = Settings()
+settings = get_settings()
@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+
+from services import context_service
+from services.context_service import ContextBuilder
+
+
+def _query_vector(text):
+    # Repeated and paraphrased questions embed to the same direction
+    return np.ones(384, dtype=np.float32)
+
+
+class SemanticCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        context_service._SEMANTIC_CACHE.clear()
+        self.web_results = [{"title": "Photosynthesis", "url": "https://example.com", "snippet": "Light to sugar"}]
+        self.documents = [SimpleNamespace(id=1, filename="notes.txt", text="Plants", total=1)]
+        patches = [
+            patch.object(context_service, "generate_embedding_cached", side_effect=_query_vector),
+            patch.object(context_service, "search_web", new=AsyncMock(return_value=self.web_results)),
+            patch.object(context_service, "get_document_previews_async", new=AsyncMock(return_value=self.documents)),
+            patch.object(context_service, "search_documents_async", new=AsyncMock(return_value=[])),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _builder(self, history, document_state=(1, 1)):
+        builder = ContextBuilder(db=None, enable_reasoning=False)
+        builder._document_state = AsyncMock(return_value=document_state)
+        builder._get_history_lines = AsyncMock(return_value=history)
+        return builder
+
+    async def test_repeated_question_hits_on_the_next_turn(self):
+        first = await self._builder(["You: What is photosynthesis?"]).build_context(1, "What is photosynthesis?")
+        # The first turn stored a user and a bot message, so the history has grown
+        second_history = [
+            "You: What is photosynthesis?",
+            "Assistant: Plants turn light into sugar.",
+            "You: what is photosynthesis",
+        ]
+        second = await self._builder(second_history).build_context(1, "what is photosynthesis")
+
+        self.assertEqual(first["metadata"]["cache"], "miss")
+        self.assertEqual(second["metadata"]["cache"], "hit")
+        self.assertEqual(context_service.search_web.await_count, 1)
+        self.assertEqual(context_service.get_document_previews_async.await_count, 1)
+        # History is always loaded fresh, only retrieval results are reused
+        self.assertIn("Assistant: Plants turn light into sugar.", second["context"])
+        self.assertIn("Light to sugar", second["context"])
+
+    async def test_document_upload_misses(self):
+        await self._builder([]).build_context(1, "What is photosynthesis?")
+        result = await self._builder([], document_state=(2, 2)).build_context(1, "What is photosynthesis?")
+
+        self.assertEqual(result["metadata"]["cache"], "miss")
+        self.assertEqual(context_service.search_web.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
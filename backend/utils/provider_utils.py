@@ -0,0 +1,52 @@
+import json
+from typing import AsyncIterator, Tuple
+
+import httpx
+
+SYSTEM_MESSAGE = "You are a helpful research assistant."
+
+def chat_completion_request(
+    base_url: str,
+    api_key: str,
+    model: str,
+    prompt: str,
+    stream: bool = False
+) -> Tuple[str, dict, dict]:
+    """URL, headers and payload for an OpenAI-compatible chat completions call"""
+    url = base_url.rstrip('/')
+    if not url.endswith('/v1/chat/completions'):
+        url = f"{url}/v1/chat/completions"
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json; charset=utf-8",
+    }
+
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7,
+    }
+    if stream:
+        payload["stream"] = True
+    return url, headers, payload
+
+async def stream_chat_completion(url: str, headers: dict, payload: dict) -> AsyncIterator[str]:
+    """Yield the content pieces of an OpenAI-compatible server-sent event stream"""
+    async with httpx.AsyncClient() as client:
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=30) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
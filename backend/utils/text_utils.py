@@ -1,10 +1,106 @@
+import hashlib
+import os
+import threading
 import tiktoken
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str) -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(model_name)
+
+def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    """Count the tokens in text for the given model."""
+    # encode_ordinary treats "<|endoftext|>" and other special-token text in user
+    # input as plain text; encode() would raise on it
+    return len(_get_encoding(model_name).encode_ordinary(text))
+
+def count_tokens_batch(texts: list[str], model_name: str = "gpt-4o") -> list[int]:
+    """Count the tokens in several texts with one multi-threaded tiktoken call."""
+    if not texts:
+        return []
+    return [len(tokens) for tokens in _get_encoding(model_name).encode_ordinary_batch(texts)]
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four UTF-8 bytes per token for English) without encoding."""
+    return (len(text.encode("utf-8")) + 3) // 4
+
+# Long texts are encoded in segments of about this many characters (cut at
+# paragraph breaks) so encoding stops soon after the token limit is passed
+TRIM_SEGMENT_CHARS = 20000
+MIN_TRIM_SEGMENT_CHARS = 2000
+# Texts longer than this encode several segments at once on tiktoken's threads
+PARALLEL_TRIM_CHARS = 200000
+TRIM_THREADS = min(8, os.cpu_count() or 1)
+
+def _paragraph_segments(text: str, size: int):
+    """Yield consecutive slices of about size characters, cut at a paragraph break,
+    else at a space, else hard, so the slices never grow past twice the size"""
+    start = 0
+    while start < len(text):
+        end = text.find("\n\n", start + size, start + 2 * size)
+        if end == -1:
+            end = text.find(" ", start + size, start + 2 * size)
+        if end == -1:
+            end = min(len(text), start + size)
+        yield text[start:end]
+        start = end
+
+# Results of trims that needed encoding, keyed by a hash of the text
+_TRIM_CACHE: "OrderedDict[tuple, object]" = OrderedDict()
+_TRIM_CACHE_MAX = 256
+_TRIM_CACHE_LOCK = threading.Lock()
+_UNTRIMMED = object()
 
 def trim_text_to_token_limit(text: str, max_tokens: int, model_name: str = "gpt-4o") -> str:
-    enc = tiktoken.encoding_for_model(model_name)
-    tokens = enc.encode(text)
-    if len(tokens) <= max_tokens:
+    # Every token covers at least one UTF-8 byte and a character is at most four
+    # bytes, so short texts are returned without encoding. Character count alone
+    # is not a safe bound: a single CJK or emoji character can be several tokens
+    if len(text) * 4 <= max_tokens:
         return text
-    trimmed_tokens = tokens[:max_tokens]
-    trimmed_text = enc.decode(trimmed_tokens)
-    return trimmed_text
+    if len(text) <= max_tokens and len(text.encode("utf-8")) <= max_tokens:
+        return text
+
+    # The same prompts and retrieved chunks are trimmed again across requests
+    key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), max_tokens, model_name)
+    with _TRIM_CACHE_LOCK:
+        cached = _TRIM_CACHE.get(key)
+        if cached is not None:
+            _TRIM_CACHE.move_to_end(key)
+            return text if cached is _UNTRIMMED else cached
+
+    trimmed = _trim_encoded(text, max_tokens, model_name)
+    with _TRIM_CACHE_LOCK:
+        # Texts already within the limit are recorded by marker, not held in the cache
+        _TRIM_CACHE[key] = _UNTRIMMED if trimmed is text else trimmed
+        if len(_TRIM_CACHE) > _TRIM_CACHE_MAX:
+            _TRIM_CACHE.popitem(last=False)
+    return trimmed
+
+def _trim_encoded(text: str, max_tokens: int, model_name: str) -> str:
+    enc = _get_encoding(model_name)
+    group = TRIM_THREADS if len(text) > PARALLEL_TRIM_CHARS else 1
+    # Tokens rarely span more than eight characters, so segments of this size keep
+    # the token list near max_tokens instead of growing with the input
+    size = max(MIN_TRIM_SEGMENT_CHARS, min(TRIM_SEGMENT_CHARS, max_tokens * 8))
+    segments = _paragraph_segments(text, size)
+    tokens = []
+    while batch := list(islice(segments, group)):
+        # encode_ordinary skips the special-token scan and treats "<|endoftext|>" in
+        # user text as plain text instead of raising
+        if len(batch) > 1:
+            encoded = enc.encode_ordinary_batch(batch, num_threads=group)
+        else:
+            encoded = [enc.encode_ordinary(batch[0])]
+        for segment_tokens in encoded:
+            tokens.extend(segment_tokens)
+            if len(tokens) > max_tokens:
+                return enc.decode(tokens[:max_tokens])
+    return text
+
+
+def chunk_text(text: str, max_words: int = 200) -> list[str]:
+    """Split text into consecutive chunks of at most max_words words."""
+    words = text.split()
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]